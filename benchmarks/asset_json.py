@@ -0,0 +1,105 @@
+"""
+Benchmarks for parsing Starbound's relaxed JSON assets
+
+Builds synthetic asset files shaped like items, .frames and humanoid.config
+and times parsing them with the old comment regex and with relaxedjson,
+checking both give the same result:
+$ python ./benchmarks/asset_json.py [--repeat=count] [size in KB]...
+"""
+
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "starcheat"))
+
+from assets import relaxedjson
+
+
+# what assets.core used before relaxedjson
+comment_re = re.compile(
+    '("(\\[\s\S]|[^"])*")|((^)?[^\S\n]*/(?:\*(.*?)\*/[^\S\n]*|/[^\n]*)($)?)',
+    re.DOTALL | re.MULTILINE
+)
+
+repeat = 20
+default_sizes = (2, 16, 128, 1024)
+
+
+def legacy_loads(content):
+    decoder = json.JSONDecoder(strict=False)
+    content = comment_re.sub(lambda m: m.group(1) or '', content)
+    return decoder.decode(content)
+
+
+def item_chunk(i):
+    """An item with asset paths in it and a few comments, like most of the
+    vanilla .item, .object and .activeitem files."""
+    item = {
+        "itemName": "syntheticitem%d" % i,
+        "rarity": "Common",
+        "category": "craftingMaterial",
+        "inventoryIcon": "/items/generic/crafting/synthetic%d.png" % i,
+        "description": "Item number %d, it's not real." % i,
+        "shortdescription": "Synthetic Item %d" % i,
+        "price": i % 1000,
+        "learnBlueprintsOnPickup": ["syntheticrecipe%d" % i],
+        "colorOptions": [{"ffca8a": "%06x" % (i * 97 % 0xffffff)}]
+    }
+    text = json.dumps(item, indent=2)
+    return ("// synthetic item %d\n" % i +
+            text.replace('"price"', '/* not final */ "price"', 1)
+            .replace('"rarity": "Common",', '"rarity": "Common", // for now', 1))
+
+
+def frames_chunk(i):
+    """Frame grid entries, with no comments at all."""
+    return json.dumps({"frame%d.%d" % (i, j): [j * 43, 0, j * 43 + 43, 43]
+                       for j in range(8)})
+
+
+def asset_text(size, chunk):
+    """Return an asset file of roughly size bytes, a JSON list of chunks."""
+    parts = []
+    total = 0
+    i = 0
+    while total < size:
+        parts.append(chunk(i))
+        total += len(parts[-1]) + 2
+        i += 1
+    return "[\n" + ",\n".join(parts) + "\n]\n"
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    for i in range(repeat):
+        func(*args)
+    return (time.perf_counter() - start) / repeat
+
+
+def bench_parse(sizes, chunk):
+    print("%10s %12s %12s %9s" % ("size", "legacy", "relaxed", "speedup"))
+    for size in sizes:
+        text = asset_text(size * 1024, chunk)
+        if legacy_loads(text) != relaxedjson.loads(text):
+            raise AssertionError("Results differ at %dKB" % size)
+        old = timed(legacy_loads, text)
+        new = timed(relaxedjson.loads, text)
+        print("%8dKB %10.3fms %10.3fms %8.1fx" % (len(text) // 1024,
+                                                  old * 1000, new * 1000,
+                                                  old / new))
+
+
+if __name__ == "__main__":
+    while len(sys.argv) > 1 and sys.argv[1].startswith("--"):
+        option, value = sys.argv.pop(1).split("=")
+        if option == "--repeat":
+            repeat = int(value)
+    sizes = [int(x) for x in sys.argv[1:]] or default_sizes
+    print("items, with comments")
+    bench_parse(sizes, item_chunk)
+    print("frames, without comments")
+    bench_parse(sizes, frames_chunk)
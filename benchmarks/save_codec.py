@@ -0,0 +1,241 @@
+"""
+Benchmarks for the .player save codec
+
+Builds synthetic SBVJ01 saves of a given size and shape and times decoding
+and encoding them, like this:
+$ python ./benchmarks/save_codec.py [--timeout=seconds] [--shape=name] [size in KB]...
+"""
+
+import os
+import sys
+import time
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "starcheat"))
+
+import saves
+
+
+# the legacy decoder is quadratic in file size, so it's run in a separate
+# process and given up on after this many seconds
+legacy_timeout = 300
+
+default_sizes = (100, 1024, 10 * 1024, 50 * 1024)
+
+
+def synthetic_item(i):
+    return saves.new_item("syntheticitem%d" % i, i % 1000 + 1, {
+        "shortdescription": "Synthetic Item %d" % i,
+        "level": float(i % 10),
+        "directives": "?replace;%06x=ffffff" % (i % 0xffffff),
+        "colorIndex": -(i % 12),
+        "rare": i % 2 == 0
+    })
+
+
+def deep_chunk(i, depth=40):
+    """Nested dicts and lists, depth levels deep."""
+    node = i
+    for d in range(depth):
+        if d % 2:
+            node = {"level%d" % d: node, "n": -d}
+        else:
+            node = [node, None, "level%d" % d]
+    return node
+
+
+def bag_chunk(i):
+    """A bag of 40 slots, a third of them full."""
+    return [synthetic_item(i + j) if j % 3 == 0 else None for j in range(40)]
+
+
+def string_chunk(i):
+    """A string of a few hundred bytes to tens of KB, not all ascii."""
+    return ("ünïcødé %d " % i) * (20 + i * 37 % 3000)
+
+
+def number_chunk(i):
+    """Negative and multi byte vlqs, special doubles and bools."""
+    sign = -1 if i % 2 else 1
+    return [sign * ((i * 7919) ** (i % 4 + 1) % 2 ** 62), -i, -64, 63, 64,
+            float("nan"), float("-inf"), float("inf"), -0.0, i / 7.0,
+            i % 3 == 0]
+
+
+# entity shapes other than "player", as a function returning a piece of the
+# entity to repeat until it's big enough
+shapes = {
+    "deep": deep_chunk,
+    "bags": bag_chunk,
+    "strings": string_chunk,
+    "numbers": number_chunk
+}
+
+
+def synthetic_entity(size, shape="player"):
+    """Return a player entity that encodes to roughly size bytes. Any shape
+    but "player" fills it with many copies of that shape's chunk."""
+    if shape != "player":
+        return shaped_entity(size, shapes[shape])
+
+    entity = {
+        "uuid": "0" * 32,
+        "identity": {
+            "name": "Benchmark",
+            "species": "human",
+            "gender": "male",
+            "personalityIdle": "idle.1"
+        },
+        "statusController": {
+            "resourceValues": {"health": float("nan"), "energy": 100.0}
+        },
+        "description": "synthetic save for benchmarks",
+        "playTime": 0.0,
+        "inventory": {
+            "money": 0,
+            "bag": [None] * 40,
+            "objectBag": []
+        },
+        "blueprints": {"knownBlueprints": [], "newBlueprints": []},
+        "quests": {}
+    }
+
+    base_size = len(saves.pack_variant(entity))
+    pair_size = (len(saves.pack_variant(synthetic_item(0))) +
+                 len(saves.pack_variant(saves.new_item_data("syntheticrecipe0"))))
+    bag = entity["inventory"]["objectBag"]
+    known = entity["blueprints"]["knownBlueprints"]
+    for i in range(max(0, (size - base_size) // pair_size)):
+        bag.append(synthetic_item(i))
+        known.append(saves.new_item_data("syntheticrecipe%d" % i))
+
+    return entity
+
+
+def shaped_entity(size, chunk):
+    entity = synthetic_entity(0)
+    chunks = entity["chunks"] = []
+    total = len(saves.pack_variant(entity))
+    i = 0
+    while total < size:
+        chunks.append(chunk(i))
+        total += len(saves.pack_variant(chunks[-1]))
+        i += 1
+    return entity
+
+
+def synthetic_save(size, shape="player"):
+    """Return the raw bytes of a complete .player file."""
+    save = {
+        "entity_name": "PlayerEntity",
+        "variant_version": 1,
+        "variant_subversion": 1,
+        "data": synthetic_entity(size, shape)
+    }
+    return (saves.data_version.encode("utf-8") +
+            saves.pack_starsave(save))
+
+
+def legacy_decode(data):
+    offset = 0
+    for var in saves.data_format:
+        unpacked = saves.unpack_var(var, data[offset:])
+        offset += unpacked[1]
+
+
+def cursor_decode(data):
+    offset = 0
+    for var in saves.data_format:
+        unpacked, offset = saves.read_var(var, data, offset)
+
+
+def cursor_encode(data):
+    offset = 0
+    encoder = saves.SaveEncoder()
+    for var in saves.data_format:
+        unpacked, offset = saves.read_var(var, data, offset)
+        encoder.write_var(var, unpacked)
+    return encoder
+
+
+def summary_decode(data):
+    header, offset = saves.read_var(saves.data_format[0], data, 0)
+    saves.read_starsave(data, offset, saves.parse_keys(saves.summary_keys))
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def timed_worker(result, func, *args):
+    result.put(timed(func, *args))
+
+
+def timed_with_timeout(timeout, func, *args):
+    """Like timed() but return None if func takes longer than timeout."""
+    result = multiprocessing.Queue()
+    worker = multiprocessing.Process(target=timed_worker,
+                                     args=(result, func) + args)
+    worker.start()
+    worker.join(timeout)
+    if worker.is_alive():
+        worker.terminate()
+        worker.join()
+        return None
+    return result.get()
+
+
+def bench_decode(sizes):
+    print("%10s %12s %12s %9s" % ("size", "legacy", "cursor", "speedup"))
+    for size in sizes:
+        data = synthetic_save(size * 1024)
+        new = timed(cursor_decode, data)
+        old = timed_with_timeout(legacy_timeout, legacy_decode, data)
+        if old is not None:
+            print("%8dKB %11.3fs %11.3fs %8.1fx" % (len(data) // 1024,
+                                                    old, new, old / new))
+        else:
+            print("%8dKB %11s %11.3fs %8s" % (len(data) // 1024,
+                                              ">%ds" % legacy_timeout, new,
+                                              ">%dx" % (legacy_timeout / new)))
+
+
+def bench_summary(sizes):
+    print("%10s %12s %12s %9s" % ("size", "full", "summary", "speedup"))
+    for size in sizes:
+        data = synthetic_save(size * 1024)
+        full = timed(cursor_decode, data)
+        summary = timed(summary_decode, data)
+        print("%8dKB %11.3fs %11.3fs %8.1fx" % (len(data) // 1024,
+                                                full, summary, full / summary))
+
+
+def bench_throughput(sizes, shape_names):
+    print("%10s %8s %12s %12s" % ("size", "shape", "decode", "encode"))
+    for shape in shape_names:
+        for size in sizes:
+            data = synthetic_save(size * 1024, shape)
+            megabytes = len(data) / 1024 / 1024
+            decode = timed(cursor_decode, data)
+            # decoding again to encode, so take the decode off
+            encode = max(timed(cursor_encode, data) - decode, 1e-9)
+            print("%8dKB %8s %9.1fMB/s %9.1fMB/s" % (len(data) // 1024, shape,
+                                                     megabytes / decode,
+                                                     megabytes / encode))
+
+
+if __name__ == "__main__":
+    shape_names = ["player"] + sorted(shapes)
+    while len(sys.argv) > 1 and sys.argv[1].startswith("--"):
+        option, value = sys.argv.pop(1).split("=")
+        if option == "--timeout":
+            legacy_timeout = int(value)
+        elif option == "--shape":
+            shape_names = [value]
+    sizes = [int(x) for x in sys.argv[1:]] or default_sizes
+    bench_decode(sizes)
+    bench_summary(sizes)
+    bench_throughput(sizes, shape_names)
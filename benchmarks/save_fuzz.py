@@ -0,0 +1,159 @@
+"""
+Round trip fuzzer for the .player save codec
+
+Checks that decoding and encoding random variants and synthetic saves gives
+back exactly the same bytes. Every case is generated from its own seed, so a
+failure can be replayed on its own, like this:
+$ python ./benchmarks/save_fuzz.py [cases] [first seed]
+"""
+
+import os
+import sys
+import math
+import random
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "starcheat"))
+
+import saves
+import save_codec
+
+
+# values sitting on vlq byte boundaries and other edge cases
+edge_ints = (0, 1, -1, 63, -64, 64, -65, 8191, -8192, 8192, 2 ** 31,
+             2 ** 63 - 1, -2 ** 63)
+edge_floats = (0.0, -0.0, float("nan"), float("inf"), float("-inf"),
+               5e-324, 1.7976931348623157e308)
+# the legacy decoder is quadratic, so keep random variants small
+max_nodes = 2000
+
+edge_strings = ("", "a", "ü", "日本語", "x" * 127, "x" * 128, "é" * 64,
+                "\x00", "?replace;ffffff=000000")
+
+
+def random_str(rand):
+    if rand.random() < 0.3:
+        return rand.choice(edge_strings)
+    length = rand.choice((rand.randint(0, 16), rand.randint(0, 300)))
+    return "".join(chr(rand.choice((rand.randint(32, 126),
+                                    rand.randint(0xa0, 0x2fff))))
+                   for i in range(length))
+
+
+def random_variant(rand, depth=0, budget=None):
+    """Return a random variant of at most about max_nodes nodes, containers
+    get rarer the deeper it goes."""
+    if budget is None:
+        budget = [max_nodes]
+    budget[0] -= 1
+    roll = rand.random()
+    if depth < 8 and budget[0] > 0 and roll < 0.3 / (depth + 1):
+        total = min(rand.choice((0, 1, 3, rand.randint(0, 200))), budget[0])
+        return [random_variant(rand, depth + 1, budget) for i in range(total)]
+    elif depth < 8 and budget[0] > 0 and roll < 0.6 / (depth + 1):
+        total = min(rand.choice((0, 1, 3, rand.randint(0, 50))), budget[0])
+        return dict((random_str(rand), random_variant(rand, depth + 1, budget))
+                    for i in range(total))
+
+    kind = rand.randint(0, 5)
+    if kind == 0:
+        return None
+    elif kind == 1:
+        return rand.random() < 0.5
+    elif kind == 2:
+        return rand.choice((rand.choice(edge_ints),
+                            rand.randint(-2 ** 63, 2 ** 63 - 1),
+                            rand.randint(-100, 100)))
+    elif kind == 3:
+        return rand.choice((rand.choice(edge_floats),
+                            rand.uniform(-1e9, 1e9)))
+    else:
+        return random_str(rand)
+
+
+class RoundTripError(Exception):
+    pass
+
+
+def check(condition, msg):
+    if not condition:
+        raise RoundTripError(msg)
+
+
+def same_value(a, b):
+    """Like saves.same_variant, but NaNs are equal and -0.0 isn't 0.0."""
+    if type(a) is not type(b):
+        return False
+    if type(a) is float:
+        if math.isnan(a) or math.isnan(b):
+            return math.isnan(a) and math.isnan(b)
+        return a == b and math.copysign(1, a) == math.copysign(1, b)
+    if type(a) is dict:
+        return (list(a) == list(b) and
+                all(same_value(v, b[k]) for k, v in a.items()))
+    if type(a) is list:
+        return (len(a) == len(b) and
+                all(same_value(x, y) for x, y in zip(a, b)))
+    return a == b
+
+
+def check_variant(var):
+    data = saves.pack_variant(var)
+    value, end = saves.read_variant(data, 0)
+    check(end == len(data), "decode stopped at %d of %d bytes" %
+          (end, len(data)))
+    check(same_value(value, var), "decoded value differs")
+    check(saves.pack_variant(value) == data, "encoding changed")
+    legacy, length = saves.unpack_variant(data)
+    check(length == len(data) and saves.pack_variant(legacy) == data,
+          "legacy decode differs")
+
+
+def check_save(rand, folder):
+    shape = rand.choice(["player"] + sorted(save_codec.shapes))
+    data = save_codec.synthetic_save(rand.randint(0, 64 * 1024), shape)
+    filename = os.path.join(folder, "fuzz.player")
+    with open(filename, "wb") as f:
+        f.write(data)
+
+    for lazy in (False, True):
+        player = saves.PlayerSave(filename, lazy=lazy)
+        check(player.export_save() == data,
+              "unchanged %s save differs" % shape)
+
+        # replace a random key and make sure only that changes
+        key = rand.choice(list(player.entity))
+        value = random_variant(rand)
+        player.entity[key] = value
+        edited = player.export_save()
+        player.close()
+        with open(filename + ".edit", "wb") as f:
+            f.write(edited)
+        reread = saves.PlayerSave(filename + ".edit")
+        check(same_value(reread.entity[key], value),
+              "edited key %s differs" % key)
+        check(list(reread.entity) == list(player.entity),
+              "key order changed")
+
+
+def fuzz(cases, first_seed):
+    folder = tempfile.mkdtemp()
+    failures = 0
+    for seed in range(first_seed, first_seed + cases):
+        rand = random.Random(seed)
+        try:
+            check_variant(random_variant(rand))
+            if seed % 10 == 0:
+                check_save(rand, folder)
+        except Exception as e:
+            failures += 1
+            print("seed %d: %s: %s" % (seed, type(e).__name__, e))
+    print("%d of %d cases failed" % (failures, cases))
+    return failures
+
+
+if __name__ == "__main__":
+    cases = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    first_seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    sys.exit(1 if fuzz(cases, first_seed) > 0 else 0)
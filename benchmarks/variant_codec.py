@@ -0,0 +1,99 @@
+"""
+Microbenchmarks for single variant nodes
+
+Times decoding and encoding the common shapes of save data and reports the
+cost per variant node, like this:
+$ python ./benchmarks/variant_codec.py [repeats]
+
+Decoding is compared against the legacy unpack_variant() baseline. It's
+quadratic in the size of a shape, so it's only run once per shape and given
+up on after save_codec.legacy_timeout seconds.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "starcheat"))
+
+import saves
+import save_codec
+
+
+shape_size = 20000
+
+
+def count_nodes(var):
+    """Return how many variants var is made of, including itself."""
+    if type(var) is list:
+        return 1 + sum(count_nodes(x) for x in var)
+    elif type(var) is dict:
+        return 1 + sum(count_nodes(x) for x in var.values())
+    return 1
+
+
+def shapes():
+    """Return (name, variant) pairs of the shapes most of a save is made of."""
+    return (
+        ("string list", ["syntheticrecipe%d" % i for i in range(shape_size)]),
+        ("item dicts", [save_codec.synthetic_item(i)
+                        for i in range(shape_size // 10)]),
+        ("none slots", [None] * shape_size),
+        ("numbers", [float(i) if i % 2 else i for i in range(shape_size)]),
+        ("entity", save_codec.synthetic_entity(1024 * 1024))
+    )
+
+
+def best_of(repeats, func, *args):
+    best = None
+    for i in range(repeats):
+        start = time.perf_counter()
+        func(*args)
+        taken = time.perf_counter() - start
+        if best is None or taken < best:
+            best = taken
+    return best
+
+
+def legacy_decode(data):
+    saves.unpack_variant(data)
+
+
+def decode(data):
+    saves.read_variant(data, 0)
+
+
+def encode(var):
+    saves.SaveEncoder().write_variant(var)
+
+
+def bench(repeats):
+    print("%-12s %10s %12s %12s %9s %12s" % ("shape", "nodes", "legacy ns",
+                                             "decode ns", "speedup",
+                                             "encode ns"))
+    for name, var in shapes():
+        nodes = count_nodes(var)
+        data = saves.pack_variant(var)
+        assert saves.read_variant(data, 0)[0] == var or name == "entity"
+        legacy_time = save_codec.timed_with_timeout(save_codec.legacy_timeout,
+                                                    legacy_decode, data)
+        decode_time = best_of(repeats, decode, data)
+        encode_time = best_of(repeats, encode, var)
+        if legacy_time is None:
+            legacy = ">%ds" % save_codec.legacy_timeout
+            speedup = ">%dx" % (save_codec.legacy_timeout / decode_time)
+        else:
+            legacy = "%.1f" % (legacy_time / nodes * 1e9)
+            speedup = "%.1fx" % (legacy_time / decode_time)
+        print("%-12s %10d %12s %12.1f %9s %12.1f" % (name, nodes, legacy,
+                                                     decode_time / nodes * 1e9,
+                                                     speedup,
+                                                     encode_time / nodes * 1e9))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        bench(int(sys.argv[1]))
+    else:
+        bench(5)
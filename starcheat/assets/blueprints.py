@@ -50,7 +50,7 @@ class Blueprints():
         c.execute("select key, path, desc from assets where type = 'blueprint' and name = ?", (name,))
         meta = c.fetchone()
         if meta is not None:
-            blueprint = self.assets.read(meta[0], meta[1])
+            blueprint = self.assets.read_cached(meta[0], meta[1])
             return blueprint, meta[0], meta[1], meta[2]
         else:
             return None
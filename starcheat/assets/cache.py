@@ -0,0 +1,83 @@
+"""
+Least recently used cache of assets with a size budget
+"""
+
+from collections import OrderedDict
+
+
+def copy_json(value):
+    """Return a deep copy of parsed JSON, a lot quicker than
+    copy.deepcopy() since only dicts and lists need copying."""
+    if type(value) is dict:
+        return {k: copy_json(v) for k, v in value.items()}
+    elif type(value) is list:
+        return [copy_json(x) for x in value]
+    return value
+
+
+class LRUCache(object):
+    """Keep values up to a total of max_size, as measured by size_of, and
+    drop the least recently used ones to make room for new ones. A value
+    bigger than the whole budget isn't kept at all.
+
+    Hits, misses and evictions are counted to tell if the budget's right."""
+    def __init__(self, max_size, size_of=len):
+        self.max_size = max_size
+        self.size_of = size_of
+        # key: (value, size)
+        self.items = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, key, default=None):
+        entry = self.items.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.items.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value, size=None):
+        self.remove(key)
+        if size is None:
+            size = self.size_of(value)
+        if size > self.max_size:
+            return
+        self.items[key] = (value, size)
+        self.size += size
+        self.shrink(self.max_size)
+
+    def remove(self, key):
+        entry = self.items.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def remove_where(self, test):
+        """Remove every value whose key passes test."""
+        for key in [x for x in self.items if test(x)]:
+            self.remove(key)
+
+    def shrink(self, max_size):
+        while self.size > max_size:
+            key, (value, size) = self.items.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+
+    def resize(self, max_size):
+        self.max_size = max_size
+        self.shrink(max_size)
+
+    def clear(self):
+        self.items.clear()
+        self.size = 0
+
+    def stats(self):
+        return {"items": len(self.items), "size": self.size,
+                "max_size": self.max_size, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
@@ -3,10 +3,14 @@ Module for reading and indexing Starbound assets
 """
 
 import os
-import json
+import hashlib
 import re
 import sqlite3
 import logging
+import mmap
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 import starbound
 import starbound.btreedb4
@@ -20,31 +24,196 @@ from assets.techs import Techs
 from assets.images import Images
 from assets.frames import Frames
 from assets.common import asset_category
+from assets import relaxedjson
+from assets.cache import LRUCache, copy_json
 
 
-# Regular expression for comments
-comment_re = re.compile(
-    '("(\\[\s\S]|[^"])*")|((^)?[^\S\n]*/(?:\*(.*?)\*/[^\S\n]*|/[^\n]*)($)?)',
-    re.DOTALL | re.MULTILINE
-)
-
 ignore_assets = re.compile(".*\.(db|ds_store|ini|psd|patch)", re.IGNORECASE)
 
+# bump this if the layout of the index tables changes, older indexes are
+# rebuilt
+index_version = 3
+# assets are sent to index workers in batches of this many
+index_batch_size = 256
+# starting worker processes only pays off with at least this many assets
+min_parallel_assets = 4096
+# most paks kept open at once
+max_open_paks = 16
+# how often an open pak is checked for changes on disk, in seconds
+pak_check_interval = 2.0
+# searches with fewer matches than this also get up to max_typo_results of
+# the closest near misses
+min_search_results = 10
+max_typo_results = 20
+# bytes of raw image files kept in memory, across every Assets
+image_cache_size = 64 * 1024 * 1024
+# bytes of JSON asset files kept in memory once parsed, measured by the
+# size of the file
+json_cache_size = 8 * 1024 * 1024
 
-def parse_json(content, key):
-    decoder = json.JSONDecoder(strict=False)
-    # Looking for comments
-    # Allows for // inside of the " " JSON data
-    content = comment_re.sub(lambda m: m.group(1) or '', content)
 
-    # Return json file
-    return decoder.decode(content)
+def parse_json(content, key):
+    # comments and trailing commas are allowed
+    return relaxedjson.loads(content)
 
 
 def load_asset_file(filename):
-    with open(filename) as f:
-        content = ''.join(f.readlines())
-        return parse_json(content, filename)
+    with open(filename, encoding="utf-8") as f:
+        return parse_json(f.read(), filename)
+
+
+def pak_fingerprint(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class MappedPak(object):
+    """A pak reader that gives files as memoryview slices of the pak mapped
+    into memory, instead of reading a copy of each one.
+
+    The offset of each file comes from the starbound reader's index. Paks it
+    doesn't have offsets for, like old BTreeDB4 ones, or that can't be
+    mapped are read through the starbound reader as before."""
+    def __init__(self, path):
+        self.path = path
+        self.pak = starbound.open_file(path)
+        self.map = None
+        self.view = None
+        # key: (offset, length), or empty if files can't be sliced out
+        self.offsets = None
+        try:
+            with open(path, "rb") as f:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self.map)
+        except (OSError, ValueError):
+            logging.debug("Unable to map pak %s", path)
+
+    def get_index(self):
+        return self.pak.get_index()
+
+    def find_offsets(self):
+        if self.view is None:
+            return {}
+        if getattr(self.pak, "index", None) is None:
+            self.pak.get_index()
+        index = getattr(self.pak, "index", None)
+        if not isinstance(index, dict):
+            return {}
+        for span in index.values():
+            if (not isinstance(span, tuple) or len(span) != 2 or
+                    span[0] + span[1] > len(self.view)):
+                return {}
+        return index
+
+    def get(self, key):
+        if self.offsets is None:
+            self.offsets = self.find_offsets()
+        if len(self.offsets) == 0:
+            return self.pak.get(key)
+        offset, length = self.offsets[key]
+        return self.view[offset:offset+length]
+
+    def close(self):
+        # readers keep the file they were opened with as their stream
+        stream = getattr(self.pak, "stream", None)
+        if stream is not None:
+            stream.close()
+        if self.map is None:
+            return
+        self.view.release()
+        try:
+            self.map.close()
+        except BufferError:
+            # slices are still in use, it's unmapped when they're gone
+            pass
+
+
+class PakPool(object):
+    """Open MappedPaks, with their key index already read, shared by every
+    Assets in the process.
+
+    Only the max_open most recently used stay open. A pak that has changed
+    on disk since it was opened is opened again, that's checked at most
+    every pak_check_interval seconds so most reads are just a lookup."""
+    def __init__(self, max_open=max_open_paks):
+        self.max_open = max_open
+        # path: (reader, fingerprint, time last checked)
+        self.paks = OrderedDict()
+
+    def get(self, path):
+        now = time.monotonic()
+        entry = self.paks.get(path)
+        if entry is not None:
+            pak, fingerprint, checked = entry
+            if now - checked < pak_check_interval:
+                self.paks.move_to_end(path)
+                return pak
+            try:
+                changed = pak_fingerprint(path) != fingerprint
+            except OSError:
+                changed = True
+            if not changed:
+                self.paks[path] = (pak, fingerprint, now)
+                self.paks.move_to_end(path)
+                return pak
+            logging.debug("Pak %s has changed, opening it again", path)
+            self.close(path)
+
+        # checked before opening, so a change while opening is caught later
+        fingerprint = pak_fingerprint(path)
+        pak = MappedPak(path)
+        self.paks[path] = (pak, fingerprint, now)
+        while len(self.paks) > self.max_open:
+            self.close(next(iter(self.paks)))
+        return pak
+
+    def reopen(self, path):
+        """Open a pak again even if it doesn't look changed, for when its
+        index has to be up to date."""
+        self.close(path)
+        return self.get(path)
+
+    def check(self, path):
+        """Make sure anything cached from a pak is still current. Only paks
+        in the pool can have anything cached."""
+        if path in self.paks:
+            self.get(path)
+
+    def close(self, path):
+        """Close a pak and forget what was cached from it, it can't be
+        checked for changes once it's out of the pool."""
+        entry = self.paks.pop(path, None)
+        if entry is not None:
+            entry[0].close()
+            forget_source(path)
+
+    def clear(self):
+        for path in list(self.paks):
+            self.close(path)
+
+
+pak_pool = PakPool()
+# (asset path, key): raw image file
+image_cache = LRUCache(image_cache_size)
+# (asset path, key): parsed JSON asset
+json_cache = LRUCache(json_cache_size)
+
+
+def forget_source(path):
+    """Drop everything cached from a pak that has changed."""
+    for cache in (image_cache, json_cache):
+        cache.remove_where(lambda x: x[0] == path)
+
+# each index worker process has its own Assets, and so its own open paks
+worker_assets = None
+
+
+def index_batch(starbound_folder, batch):
+    """Return the index rows for a list of assets in a worker process."""
+    global worker_assets
+    if worker_assets is None:
+        worker_assets = Assets(":memory:", starbound_folder)
+    return [worker_assets.index_asset(x) for x in batch]
 
 
 class Assets(object):
@@ -52,16 +221,64 @@ class Assets(object):
         self.starbound_folder = starbound_folder
         self.mods_folder = os.path.join(self.starbound_folder, "giraffe_storage", "mods")
         self.db = sqlite3.connect(db_file)
+        # the index can always be rebuilt, so it doesn't need every commit
+        # synced. with WAL reading it doesn't wait on a rebuild either
+        self.db.execute("pragma journal_mode = wal")
+        self.db.execute("pragma synchronous = normal")
         self.vanilla_assets = os.path.join(self.starbound_folder, "assets", "packed.pak")
-        self.image_cache = {}
+        self.image_cache = image_cache
+        self.index_types = None
+        self.search_table = None
 
     def init_db(self):
         c = self.db.cursor()
         c.execute("drop table if exists assets")
+        c.execute("drop table if exists sources")
+        c.execute("drop table if exists source_paths")
+        try:
+            c.execute("drop table if exists assets_search")
+        except sqlite3.OperationalError:
+            # made by an sqlite with FTS5, it'll be left behind
+            logging.exception("Unable to drop search table")
         c.execute("""create table assets
         (key text, path text, type text, category text, name text, desc text)""")
+        # what each source of assets (vanilla, a mod folder or a modpak) was
+        # like when it was indexed, and the asset paths it gave
+        c.execute("create table sources (source text primary key, fingerprint text)")
+        c.execute("create table source_paths (source text, path text)")
+        # full text search of the assets table, trigrams match any part of a
+        # word like the old name like '%x%' searches did
+        try:
+            c.execute("""create virtual table assets_search using fts5
+            (name, desc, category, content='assets', tokenize='trigram')""")
+        except sqlite3.OperationalError:
+            logging.warning("No FTS5 in sqlite %s, search will be slower",
+                            sqlite3.sqlite_version)
+        self.search_table = None
+        c.execute("pragma user_version = %d" % index_version)
         self.db.commit()
 
+    def create_db_indexes(self):
+        """Index the tables for the lookups made on them. It's quicker to do
+        this once a rebuild has filled them than to keep them up to date as
+        it goes."""
+        c = self.db.cursor()
+        c.execute("create index if not exists assets_type_name on assets (type, name)")
+        c.execute("create index if not exists assets_type_category on assets (type, category)")
+        c.execute("create index if not exists assets_key on assets (key)")
+        # for replacing what came from one source
+        c.execute("create index if not exists assets_path on assets (path)")
+        c.execute("create index if not exists source_paths_source on source_paths (source)")
+        if self.has_search_table():
+            c.execute("insert into assets_search (assets_search) values ('rebuild')")
+
+    def has_search_table(self):
+        if self.search_table is None:
+            c = self.db.cursor()
+            c.execute("select 1 from sqlite_master where name = 'assets_search'")
+            self.search_table = c.fetchone() is not None
+        return self.search_table
+
     def total_indexed(self):
         c = self.db.cursor()
         try:
@@ -71,50 +288,93 @@ class Assets(object):
             return 0
         return c.fetchone()[0]
 
-    def create_index(self, asset_files=False):
+    def create_index(self, asset_files=False, jobs=None):
+        """Index every asset, yielding each (key, path) as it's done.
+
+        Reading and parsing assets is split over jobs processes (one per CPU
+        by default), the rows all come back here to be written in the same
+        order a single process would have."""
         logging.info("Creating new assets index...")
-        if not asset_files:
+        if asset_files is False:
             asset_files = self.find_assets()
 
-        blueprints = Blueprints(self)
-        items = Items(self)
-        species = Species(self)
-        monsters = Monsters(self)
-        techs = Techs(self)
-        frames = Frames(self)
-
         new_index_query = "insert into assets values (?, ?, ?, ?, ?, ?)"
         c = self.db.cursor()
+        rows = []
 
-        for asset in asset_files:
+        for asset, tmp_data in self.index_assets(asset_files, jobs):
             yield (asset[0], asset[1])
 
-            tmp_data = None
-
-            if asset_category(asset[0]) != '':
-                if asset[0].endswith(".png"):
-                    tmp_data = (asset[0], asset[1], "image", "", "", "")
-                elif blueprints.is_blueprint(asset[0]):
-                    tmp_data = blueprints.index_data(asset)
-                elif species.is_species(asset[0]):
-                    tmp_data = species.index_data(asset)
-                elif items.is_item(asset[0]):
-                    tmp_data = items.index_data(asset)
-                elif monsters.is_monster(asset[0]):
-                    tmp_data = monsters.index_data(asset)
-                elif techs.is_tech(asset[0]):
-                    tmp_data = techs.index_data(asset)
-                elif frames.is_frames(asset[0]):
-                    tmp_data = frames.index_data(asset)
-            else:
-                logging.warning("Skipping invalid asset (no file extension) %s in %s" % (asset[0], asset[1]))
-
             if tmp_data is not None:
-                c.execute(new_index_query, tmp_data)
+                rows.append(tmp_data)
+            if len(rows) >= index_batch_size:
+                c.executemany(new_index_query, rows)
+                rows = []
 
+        c.executemany(new_index_query, rows)
+        self.create_db_indexes()
         self.db.commit()
         logging.info("Finished creating index")
 
+    def index_assets(self, asset_files, jobs=None):
+        """Yield (asset, index row or None) for every asset, in order."""
+        if jobs == 1 or len(asset_files) < min_parallel_assets:
+            for asset in asset_files:
+                yield asset, self.index_asset(asset)
+            return
+
+        batches = [asset_files[i:i+index_batch_size]
+                   for i in range(0, len(asset_files), index_batch_size)]
+        pool = ProcessPoolExecutor(max_workers=jobs)
+        futures = [pool.submit(index_batch, self.starbound_folder, x)
+                   for x in batches]
+        try:
+            # results are handed back in order as soon as each is ready
+            for batch, future in zip(batches, futures):
+                for asset, tmp_data in zip(batch, future.result()):
+                    yield asset, tmp_data
+        finally:
+            # don't wait on the rest if indexing was aborted
+            for future in futures:
+                future.cancel()
+            pool.shutdown(wait=False)
+
+    def get_index_types(self):
+        """Return (check function, indexer) for each type of asset."""
+        if self.index_types is None:
+            blueprints = Blueprints(self)
+            items = Items(self)
+            species = Species(self)
+            monsters = Monsters(self)
+            techs = Techs(self)
+            frames = Frames(self)
+            self.index_types = (
+                (blueprints.is_blueprint, blueprints),
+                (species.is_species, species),
+                (items.is_item, items),
+                (monsters.is_monster, monsters),
+                (techs.is_tech, techs),
+                (frames.is_frames, frames)
+            )
+        return self.index_types
+
+    def index_asset(self, asset):
+        """Return the index row for a (key, path) asset, or None if it's not
+        something that gets indexed."""
+        if asset_category(asset[0]) == '':
+            logging.warning("Skipping invalid asset (no file extension) %s in %s" % (asset[0], asset[1]))
+            return None
+        if asset[0].endswith(".png"):
+            return (asset[0], asset[1], "image", "", "", "")
+        for is_type, index_type in self.get_index_types():
+            if is_type(asset[0]):
+                return index_type.index_data(asset)
+        return None
+
+    def open_pak(self, path):
+        """Return an open pak file from the shared pool."""
+        return pak_pool.get(path)
+
     def find_assets(self):
         """Scan all Starbound assets and return key/file list.
 
@@ -122,30 +382,130 @@ class Assets(object):
 
         """
         index = []
-        vanilla_path = os.path.join(self.starbound_folder, "assets")
-        logging.info("Scanning vanilla assets")
-        vanilla_assets = self.scan_asset_folder(vanilla_path)
-        [index.append(x) for x in vanilla_assets]
+        for source in self.find_sources():
+            index += self.scan_source(source)
+        return index
+
+    def find_sources(self):
+        """Return every vanilla or mod folder and modpak, vanilla first."""
+        sources = [os.path.join(self.starbound_folder, "assets")]
 
         mods_path = self.mods_folder
         if not os.path.isdir(mods_path):
-            return index
+            return sources
 
-        for mod in os.listdir(mods_path):
+        for mod in sorted(os.listdir(mods_path)):
             mod_folder = os.path.join(mods_path, mod)
-            if os.path.isdir(mod_folder):
-                logging.info("Scanning mod folder: " + mod)
-                mod_assets = self.scan_asset_folder(mod_folder)
-                [index.append(x) for x in mod_assets]
-            elif mod_folder.endswith(".modpak"):
-                logging.info("Scanning modpak: " + mod)
-                mod_assets = self.scan_modpak(mod_folder)
-                [index.append(x) for x in mod_assets]
-        return index
+            if os.path.isdir(mod_folder) or mod_folder.endswith(".modpak"):
+                sources.append(mod_folder)
+        return sources
+
+    def scan_source(self, source):
+        """Return the key/file list of a single source."""
+        if os.path.isdir(source):
+            logging.info("Scanning asset folder: " + source)
+            return self.scan_asset_folder(source)
+        else:
+            logging.info("Scanning modpak: " + source)
+            return self.scan_modpak(source)
+
+    def source_fingerprint(self, source):
+        """Return a string that changes whenever anything in a source does."""
+        if not os.path.isdir(source):
+            stat = os.stat(source)
+            return "%d:%d" % (stat.st_size, stat.st_mtime_ns)
+
+        fingerprint = hashlib.md5()
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for f in sorted(files):
+                path = os.path.join(root, f)
+                stat = os.stat(path)
+                fingerprint.update(("%s:%d:%d\n" % (os.path.relpath(path, source),
+                                                    stat.st_size,
+                                                    stat.st_mtime_ns)).encode())
+        return fingerprint.hexdigest()
+
+    def indexed_sources(self):
+        """Return the fingerprint of every source in the index."""
+        c = self.db.cursor()
+        try:
+            c.execute("pragma user_version")
+            if c.fetchone()[0] != index_version:
+                # an older index, it all needs rebuilding
+                return {}
+            c.execute("select source, fingerprint from sources")
+        except sqlite3.DatabaseError:
+            # database may be corrupt
+            return {}
+        return dict(c.fetchall())
+
+    def find_changes(self):
+        """Compare every source to what was indexed from it.
+
+        Returns (full, changes). changes is a list of (source, fingerprint)
+        for sources to be indexed again, fingerprint is None for ones that
+        are gone. full is set if the whole index needs rebuilding, which is
+        whenever vanilla changed so it stays ahead of mods in the index."""
+        indexed = self.indexed_sources()
+        sources = self.find_sources()
+        changes = []
+        for source in sources:
+            try:
+                fingerprint = self.source_fingerprint(source)
+            except OSError:
+                continue
+            if indexed.get(source) != fingerprint:
+                changes.append((source, fingerprint))
+        for source in indexed:
+            if source not in sources:
+                changes.append((source, None))
+
+        full = len(changes) > 0 and changes[0][0] == sources[0]
+        if full:
+            changes = [x for x in changes if x[1] is not None]
+            changes += [(x, self.source_fingerprint(x)) for x in sources[1:]
+                        if x not in dict(changes) and os.path.exists(x)]
+        return full, changes
+
+    def scan_changes(self, changes):
+        """Return (source, fingerprint, key/file list) for each change, the
+        list is empty for removed sources."""
+        scanned = []
+        for source, fingerprint in changes:
+            if fingerprint is None:
+                scanned.append((source, None, []))
+            else:
+                scanned.append((source, fingerprint, self.scan_source(source)))
+        return scanned
+
+    def update_index(self, scanned, full=False, jobs=None):
+        """Replace what's indexed from some sources, see find_changes and
+        scan_changes. Yields each asset as it's done like create_index,
+        nothing is committed unless it finishes."""
+        if full:
+            self.init_db()
+
+        c = self.db.cursor()
+        for source, fingerprint, asset_files in scanned:
+            c.execute("""delete from assets where path in
+            (select path from source_paths where source = ?)""", (source,))
+            c.execute("delete from source_paths where source = ?", (source,))
+            c.execute("delete from sources where source = ?", (source,))
+            if fingerprint is None:
+                logging.info("Removing source from index: " + source)
+                continue
+            c.execute("insert into sources values (?, ?)", (source, fingerprint))
+            c.executemany("insert into source_paths values (?, ?)",
+                          ((source, x) for x in set(x[1] for x in asset_files)))
+
+        asset_files = [x for s in scanned for x in s[2]]
+        for asset in self.create_index(asset_files, jobs):
+            yield asset
 
     def scan_modpak(self, modpak):
         # TODO: may need support for reading the mod folder from the pakinfo file
-        db = starbound.open_file(modpak)
+        db = pak_pool.reopen(modpak)
         index = [(x, modpak) for x in db.get_index()]
         return index
 
@@ -153,7 +513,7 @@ class Assets(object):
         pak_path = os.path.join(folder, "packed.pak")
 
         if os.path.isfile(pak_path):
-            db = starbound.open_file(pak_path)
+            db = pak_pool.reopen(pak_path)
             index = [(x, pak_path) for x in db.get_index()]
             return index
         else:
@@ -186,7 +546,7 @@ class Assets(object):
             elif found_mod_info and self.is_packed_file(mod_assets):
                 # TODO: make a .pak scanner function that works for vanilla and mods
                 pak_path = os.path.normpath(mod_assets)
-                db = starbound.open_file(pak_path)
+                db = pak_pool.reopen(pak_path)
                 for x in db.get_index():
                     # removes thumbs.db etc from user pak files
                     if re.match(ignore_assets, x) is None:
@@ -211,32 +571,50 @@ class Assets(object):
         """
         return os.path.isfile(path)
 
-    def read(self, key, path, image=False):
+    def read_cached(self, key, path):
+        """Return a parsed JSON asset like read, keeping it in memory for
+        the next time it's needed. Only assets from paks are kept, until the
+        pak changes. The caller gets a copy so it's free to change it."""
+        pak_pool.check(path)
+        asset = json_cache.get((path, key.lower()))
+        if asset is None:
+            asset = self.read(key, path, cache=True)
+        return copy_json(asset)
+
+    def read(self, key, path, image=False, cache=False):
+        # try the cache first. images missing from a mod are cached under
+        # vanilla's path when they're read from there instead
+        cache_key = (path, key)
+        if image:
+            pak_pool.check(path)
+            img = self.image_cache.get(cache_key)
+            if img is not None:
+                return img
+
         if self.is_packed_file(path):
             key = key.lower()
-            db = starbound.open_file(path)
-
-            # try the cache first
-            if image and key in self.image_cache:
-                return self.image_cache[key]
+            db = self.open_pak(path)
 
             try:
                 data = db.get(key)
             except KeyError:
                 if image and path != self.vanilla_assets:
-                    img = self.read(key, self.vanilla_assets, image)
-                    self.image_cache[key] = img
-                    return img
+                    return self.read(key, self.vanilla_assets, image)
                 else:
                     logging.exception("Unable to read db asset '%s' from '%s'" % (key, path))
                     return None
             if image:
-                img = data
-                self.image_cache[key] = img
+                # BytesIO would copy a slice anyway, and a cached slice would
+                # keep the whole pak mapped
+                img = bytes(data)
+                self.image_cache.put(cache_key, img)
                 return img
             else:
                 try:
-                    asset = parse_json(data.decode("utf-8"), key)
+                    # decoded straight from the mapped pak
+                    asset = parse_json(str(data, "utf-8"), key)
+                    if cache:
+                        json_cache.put((path, key), asset, len(data))
                     return asset
                 except ValueError:
                     logging.exception("Unable to read db asset '%s' from '%s'" % (key, path))
@@ -246,7 +624,7 @@ class Assets(object):
             try:
                 if image:
                     img = open(asset_file, "rb").read()
-                    self.image_cache[key] = img
+                    self.image_cache.put(cache_key, img)
                     return img
                 else:
                     asset = load_asset_file(asset_file)
@@ -254,13 +632,9 @@ class Assets(object):
             except (FileNotFoundError, ValueError):
                 if image and path != self.vanilla_assets:
                     if self.is_packed_file(self.vanilla_assets):
-                        img = self.read(key.replace("\\", "/"), self.vanilla_assets, image)
-                        self.image_cache[key] = img
-                        return img
+                        return self.read(key.replace("\\", "/"), self.vanilla_assets, image)
                     else:
-                        img = self.read(key, self.vanilla_assets, image)
-                        self.image_cache[key] = img
-                        return img
+                        return self.read(key, self.vanilla_assets, image)
                 else:
                     logging.exception("Unable to read asset file '%s' from '%s'" % (key, path))
                     return None
@@ -300,8 +674,20 @@ class Assets(object):
         return [x[0] for x in c.fetchall()]
 
     def filter(self, asset_type, category, name):
+        """Return the assets of a type in a category with every word of name
+        in their name, description or category, best matches first.
+
+        Without a search table, or with words too short to search for,
+        they're looked for in the name and description as one string."""
         if category == "<all>":
             category = "%"
+        words = name.lower().split()
+        if (len(words) > 0 and min(len(x) for x in words) >= 3 and
+                self.has_search_table()):
+            try:
+                return self.search(asset_type, category, words)
+            except sqlite3.OperationalError:
+                logging.exception("Unable to search assets index")
         name = "%" + name + "%"
         c = self.db.cursor()
         q = """select * from assets where type = ? and category like ?
@@ -310,6 +696,40 @@ class Assets(object):
         result = c.fetchall()
         return result
 
+    def search(self, asset_type, category, words):
+        """Search for assets with every word in them. If there's only a few,
+        assets sharing at least a third of the three letter runs in the words
+        are added after them, to catch typos."""
+        q = """select assets.* from assets_search
+        join assets on assets.rowid = assets_search.rowid
+        where assets_search match ? and assets.type = ?
+        and assets.category like ?
+        order by bm25(assets_search, 10.0, 5.0, 1.0) limit ?"""
+
+        def phrase(text):
+            return '"%s"' % text.replace('"', '""')
+
+        c = self.db.cursor()
+        c.execute(q, (" AND ".join(phrase(x) for x in words), asset_type,
+                      category, -1))
+        result = c.fetchall()
+        if len(result) >= min_search_results:
+            return result
+
+        trigrams = set(x[i:i+3] for x in words for i in range(len(x) - 2))
+
+        def near_miss(row):
+            text = " ".join(x for x in row[3:] if x).lower()
+            return sum(1 for x in trigrams if x in text) * 3 >= len(trigrams)
+
+        # the ranking puts the ones sharing the most first, but not only them
+        c.execute(q, (" OR ".join(phrase(x) for x in sorted(trigrams)),
+                      asset_type, category,
+                      len(result) + max_typo_results * 5))
+        found = set(result)
+        near = [x for x in c.fetchall() if x not in found and near_miss(x)]
+        return result + near[:max_typo_results]
+
     def get_total(self, asset_type):
         c = self.assets.db.cursor()
         c.execute("select count(*) from assets where type = ?", (asset_type))
@@ -46,7 +46,7 @@ class Frames(object):
         c.execute(q, (name,))
         meta = c.fetchone()
         if meta is not None:
-            frames = self.assets.read(meta[0], meta[1])
+            frames = self.assets.read_cached(meta[0], meta[1])
             return frames, meta[0], meta[1], meta[2]
         else:
             return None
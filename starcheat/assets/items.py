@@ -120,7 +120,7 @@ class Items(object):
         c.execute("select key, path, desc from assets where type = 'item' and name = ?", (name,))
         meta = c.fetchone()
         if meta is not None:
-            item = self.assets.read(meta[0], meta[1])
+            item = self.assets.read_cached(meta[0], meta[1])
             return item, meta[0], meta[1], meta[2]
         else:
             return None
@@ -0,0 +1,52 @@
+"""
+Parse the relaxed JSON Starbound assets are written in
+
+Assets can have // and /* */ comments, and some mods leave a trailing comma
+at the end of a list or object. Comments are stripped in one pass of a
+tokenizing regex that steps over strings and plain JSON in bulk, so only
+comments are handled one by one.
+"""
+
+import json
+import re
+
+decoder = json.JSONDecoder(strict=False)
+
+# a run of anything but comments, strings included, or one comment. only
+# the runs are captured, so joining the captures strips the comments
+token = re.compile(r'''
+    ((?: [^"/]+                          # plain JSON
+       | "[^"\\]*(?:\\.[^"\\]*)*"?        # a string, maybe unterminated
+       | /(?![/*])                       # a slash that isn't a comment
+    )+)
+    | //[^\n]*                           # the newline stays
+    | /\*(?:.*?\*/|.*)                   # maybe unterminated
+''', re.DOTALL | re.VERBOSE)
+# only looked for when a file doesn't parse, it's rare
+trailing_comma = re.compile(r'("[^"\\]*(?:\\.[^"\\]*)*")|,(\s*[\]}])', re.DOTALL)
+
+
+def strip_comments(text):
+    """Return text with its comments removed. Anything inside a string is
+    left as it is, escaped quotes included."""
+    # most files don't have any
+    if "//" not in text and "/*" not in text:
+        return text
+
+    return "".join(token.findall(text))
+
+
+def strip_trailing_commas(text):
+    return trailing_comma.sub(lambda m: m.group(1) or m.group(2), text)
+
+
+def loads(text):
+    """Parse relaxed JSON text, raises ValueError if it isn't valid."""
+    text = strip_comments(text)
+    try:
+        return decoder.decode(text)
+    except ValueError:
+        fixed = strip_trailing_commas(text)
+        if fixed == text:
+            raise
+        return decoder.decode(fixed)
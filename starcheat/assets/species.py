@@ -23,8 +23,8 @@ class Species(object):
     def __init__(self, assets):
         self.assets = assets
         self.starbound_folder = assets.starbound_folder
-        self.humanoid_config = self.assets.read("/humanoid.config",
-                                                self.assets.vanilla_assets)
+        self.humanoid_config = self.assets.read_cached("/humanoid.config",
+                                                       self.assets.vanilla_assets)
 
     def is_species(self, key):
         if key.endswith(".species"):
@@ -76,7 +76,7 @@ class Species(object):
             # species is not indexed
             logging.warning("Unable to load species: %s", name)
             return None
-        species_data = self.assets.read(species[0], species[1])
+        species_data = self.assets.read_cached(species[0], species[1])
         if species_data is None:
             # corrupt save, no race set
             logging.warning("No race set on player")
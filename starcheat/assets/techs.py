@@ -47,8 +47,8 @@ class Techs():
         if tech is None:
             return
 
-        asset = self.assets.read(tech[0], tech[1])
-        info = self.assets.read(tech[0]+"item", tech[1])
+        asset = self.assets.read_cached(tech[0], tech[1])
+        info = self.assets.read_cached(tech[0]+"item", tech[1])
         icon = self.assets.read(info["inventoryIcon"], tech[1], image=True)
 
         if icon is None:
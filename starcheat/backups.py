@@ -0,0 +1,150 @@
+"""
+Compressed backups of player files
+
+A copy of a save is taken just before it's overwritten and kept compressed
+in the backup folder, either in a deduplicating backupstore.BackupStore or
+as a file named after the save and when it was taken. Only
+reading the old file holds up the save, compressing, writing and pruning
+old backups happen on a background thread (zlib and lzma both release the
+GIL while they work).
+"""
+
+import gzip
+import logging
+import lzma
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import saves
+from backupstore import BackupStore, StoreError, store_file
+
+# name: (file extension, compress func, decompress func)
+compressors = {
+    "zlib": (".gz", lambda x: gzip.compress(x, 6), gzip.decompress),
+    "lzma": (".xz", lzma.compress, lzma.decompress)
+}
+# backups kept in a BackupStore instead of a file each
+store_compression = "dedup"
+default_compression = store_compression
+# how many backups of each save to keep, and how many days to keep them for.
+# the newest backup is always kept
+default_keep = 10
+default_max_age = 30
+
+timestamp_format = "%Y%m%d-%H%M%S"
+backup_name = re.compile(r"\.(\d{8}-\d{6})-(\d{6})(\.gz|\.xz)$")
+
+
+class BackupError(Exception):
+    pass
+
+
+def list_backups(backup_folder, filename):
+    """Return (path, time taken) of every backup of filename, newest
+    first."""
+    prefix = os.path.basename(filename)
+    backups = []
+    try:
+        names = os.listdir(backup_folder)
+    except OSError:
+        return backups
+
+    for name in names:
+        match = backup_name.match(name, len(prefix))
+        if not name.startswith(prefix) or match is None:
+            continue
+        taken = time.mktime(time.strptime(match.group(1), timestamp_format))
+        taken += int(match.group(2)) / 1e6
+        backups.append((os.path.join(backup_folder, name), taken))
+    backups.sort(key=lambda x: x[1], reverse=True)
+    return backups
+
+
+def prune_backups(backup_folder, filename, keep=default_keep,
+                  max_age=default_max_age):
+    """Remove all but the newest keep backups of filename, and any older than
+    max_age days."""
+    oldest = time.time() - max_age * 24 * 60 * 60
+    for i, (path, taken) in enumerate(list_backups(backup_folder, filename)):
+        if i == 0 or (i < keep and taken >= oldest):
+            continue
+        logging.debug("Removing old backup %s", path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logging.exception("Unable to remove backup %s", path)
+
+
+def write_backup(data, path, compression):
+    compress = compressors[compression][1]
+    saves.write_atomic(path, lambda f: f.write(compress(data)))
+
+
+def store_backup(data, filename, backup_folder, taken, keep, max_age):
+    # sqlite connections can't be shared between threads, so each backup
+    # opens its own
+    store = BackupStore(os.path.join(backup_folder, store_file))
+    try:
+        store.add(filename, data, taken)
+        logging.info("Backed up %s to %s", filename, store.db_file)
+        store.prune(filename, keep, max_age)
+    finally:
+        store.close()
+
+
+def backup_file(filename, backup_folder, compression=default_compression,
+                keep=default_keep, max_age=default_max_age):
+    """Back up filename as it is right now. The file is read straight away
+    and the rest is done on a thread, which is returned (or None if there
+    was nothing to back up)."""
+    if compression != store_compression and compression not in compressors:
+        raise BackupError("Unknown compression %s" % compression)
+    try:
+        with open(filename, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+
+    now = time.time()
+
+    def worker():
+        try:
+            os.makedirs(backup_folder, exist_ok=True)
+            if compression == store_compression:
+                store_backup(data, filename, backup_folder, now, keep,
+                             max_age)
+                return
+            path = os.path.join(backup_folder, "%s.%s-%06d%s" % (
+                os.path.basename(filename),
+                time.strftime(timestamp_format, time.localtime(now)),
+                int(now % 1 * 1e6), compressors[compression][0]))
+            write_backup(data, path, compression)
+            logging.info("Backed up %s to %s", filename, path)
+            prune_backups(backup_folder, filename, keep, max_age)
+        except (OSError, sqlite3.Error, StoreError):
+            logging.exception("Unable to back up %s", filename)
+
+    # not a daemon so a backup still finishes if starcheat is closed
+    thread = threading.Thread(target=worker)
+    thread.start()
+    return thread
+
+
+def read_backup(path):
+    """Return the uncompressed contents of a backup."""
+    for extension, compress, decompress in compressors.values():
+        if path.endswith(extension):
+            with open(path, "rb") as f:
+                return decompress(f.read())
+    raise BackupError("Unknown backup type %s" % path)
+
+
+def restore_backup(path, filename):
+    """Replace filename with a backup of it."""
+    data = read_backup(path)
+    saves.write_atomic(filename, lambda f: f.write(data))
@@ -0,0 +1,237 @@
+"""
+Deduplicating store for backups of player files
+
+Each backup is split into chunks at the boundaries of its top level entity
+keys, and every chunk is kept once in an sqlite db keyed by its hash. Most
+keys of a character don't change between saves, so a new backup usually
+only adds the few that did. Big values like the inventory are split again
+between their items. A backup is rebuilt byte for byte by joining its
+chunks back together in order.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import struct
+import time
+import zlib
+
+import saves
+import versionedjson
+
+# bump this if the layout of the store tables changes
+store_version = 1
+store_file = "backups.db"
+# values bigger than this are split between their items, into chunks of
+# about a quarter of it to all of it. only containers this many levels into
+# the entity are looked at
+chunk_size = 64 * 1024
+split_depth = 2
+
+
+class StoreError(Exception):
+    pass
+
+
+def hash_chunk(chunk):
+    return hashlib.sha1(chunk).hexdigest()
+
+
+def split_variant(data, offset, bounds, depth=0):
+    """Add chunk boundaries between the items of the variant at offset if
+    it's a big list or dict, and return the offset just past it.
+
+    Where a chunk ends depends on the content of the item before it, not on
+    how big the chunk is so far, so an item that changes size doesn't shift
+    every chunk after it."""
+    if depth >= split_depth or data[offset] not in (6, 7):
+        return saves.skip_variant(data, offset)
+    is_dict = data[offset] == 7
+    start = offset
+    first = len(bounds)
+    total, offset = saves.read_vlq(data, offset + 1)
+    bounds.append(offset)
+    for i in range(total):
+        if is_dict:
+            offset = saves.skip_vlq_str(data, offset)
+        item = offset
+        offset = split_variant(data, offset, bounds, depth + 1)
+        size = offset - bounds[-1]
+        if size >= chunk_size or (
+                size >= chunk_size // 4 and
+                zlib.crc32(data[item:offset]) & 3 == 0):
+            bounds.append(offset)
+
+    # small ones stay in one piece
+    if offset - start <= chunk_size:
+        del bounds[first:]
+    return offset
+
+
+def split_save(data):
+    """Split a versioned JSON file into chunks, one per top level entity key
+    plus whatever comes before and after them. Anything that can't be read
+    is left as one chunk."""
+    try:
+        header, offset = versionedjson.read_header(data)
+        if data[offset] != 7:
+            return [data]
+        total, offset = saves.read_vlq(data, offset + 1)
+        # a chunk is a key along with its value, so it ends where the value
+        # does
+        bounds = [0, offset]
+        for i in range(total):
+            offset = split_variant(data, saves.skip_vlq_str(data, offset),
+                                   bounds)
+            bounds.append(offset)
+    except (IndexError, TypeError, struct.error, UnicodeDecodeError,
+            saves.WrongSaveVer):
+        return [data]
+
+    bounds.append(len(data))
+    return [data[bounds[i]:bounds[i+1]] for i in range(len(bounds) - 1)
+            if bounds[i+1] > bounds[i]]
+
+
+class BackupStore(object):
+    """Backups are looked up by the absolute path of the file they were
+    taken from, and identified by an id after that."""
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.db = sqlite3.connect(db_file, timeout=30)
+        self.init_db()
+
+    def init_db(self):
+        c = self.db.cursor()
+        version = c.execute("pragma user_version").fetchone()[0]
+        if version == 0:
+            c.execute("pragma user_version = %d" % store_version)
+        elif version != store_version:
+            # unlike a cache these can't just be dropped
+            raise StoreError("Unknown backup store version %d" % version)
+        c.execute("""create table if not exists snapshots
+        (id integer primary key, path text, taken real, size integer,
+         hash text)""")
+        c.execute("""create index if not exists snapshots_path
+        on snapshots (path, taken)""")
+        c.execute("""create table if not exists snapshot_chunks
+        (snapshot integer, position integer, hash text,
+         primary key (snapshot, position)) without rowid""")
+        c.execute("""create index if not exists snapshot_chunks_hash
+        on snapshot_chunks (hash)""")
+        c.execute("""create table if not exists chunks
+        (hash text primary key, size integer, data blob)""")
+        self.db.commit()
+
+    def add(self, filename, data=None, taken=None):
+        """Back up filename, or data as if it were filename's contents, and
+        return the new backup's id."""
+        path = os.path.abspath(filename)
+        if data is None:
+            with open(path, "rb") as f:
+                data = f.read()
+        if taken is None:
+            taken = time.time()
+
+        chunks = split_save(data)
+        hashes = [hash_chunk(x) for x in chunks]
+        c = self.db.cursor()
+        # only compress chunks that aren't stored yet
+        for chunk, chunk_hash in zip(chunks, hashes):
+            c.execute("select 1 from chunks where hash = ?", (chunk_hash,))
+            if c.fetchone() is None:
+                c.execute("insert or ignore into chunks values (?, ?, ?)",
+                          (chunk_hash, len(chunk), zlib.compress(chunk)))
+
+        c.execute("insert into snapshots values (null, ?, ?, ?, ?)",
+                  (path, taken, len(data), hash_chunk(data)))
+        snapshot = c.lastrowid
+        c.executemany("insert into snapshot_chunks values (?, ?, ?)",
+                      ((snapshot, i, x) for i, x in enumerate(hashes)))
+        self.db.commit()
+        logging.debug("Backed up %s as %d chunks", path, len(chunks))
+        return snapshot
+
+    def list_backups(self, filename=None):
+        """Return (id, path, time taken, size) of every backup of filename,
+        or of every file if it's None, newest first."""
+        c = self.db.cursor()
+        if filename is None:
+            c.execute("""select id, path, taken, size from snapshots
+            order by taken desc""")
+        else:
+            c.execute("""select id, path, taken, size from snapshots
+            where path = ? order by taken desc""",
+                      (os.path.abspath(filename),))
+        return c.fetchall()
+
+    def paths(self):
+        """Return the path of every file with a backup."""
+        c = self.db.cursor()
+        c.execute("select distinct path from snapshots")
+        return [x[0] for x in c.fetchall()]
+
+    def read(self, snapshot):
+        """Return the contents of a backup."""
+        c = self.db.cursor()
+        c.execute("select hash from snapshots where id = ?", (snapshot,))
+        row = c.fetchone()
+        if row is None:
+            raise StoreError("No backup %d" % snapshot)
+
+        c.execute("""select chunks.data from snapshot_chunks join chunks
+        on chunks.hash = snapshot_chunks.hash
+        where snapshot_chunks.snapshot = ?
+        order by snapshot_chunks.position""", (snapshot,))
+        data = b"".join(zlib.decompress(x[0]) for x in c.fetchall())
+        if hash_chunk(data) != row[0]:
+            raise StoreError("Backup %d is corrupt" % snapshot)
+        return data
+
+    def restore(self, snapshot, filename=None):
+        """Write a backup back over the file it was taken from, or to
+        filename instead."""
+        if filename is None:
+            c = self.db.cursor()
+            c.execute("select path from snapshots where id = ?", (snapshot,))
+            row = c.fetchone()
+            if row is None:
+                raise StoreError("No backup %d" % snapshot)
+            filename = row[0]
+        data = self.read(snapshot)
+        saves.write_atomic(filename, lambda f: f.write(data))
+        return filename
+
+    def remove(self, snapshots):
+        """Remove a list of backups and any chunks only they used."""
+        c = self.db.cursor()
+        ids = [(x,) for x in snapshots]
+        c.executemany("delete from snapshot_chunks where snapshot = ?", ids)
+        c.executemany("delete from snapshots where id = ?", ids)
+        c.execute("""delete from chunks where not exists
+        (select 1 from snapshot_chunks
+         where snapshot_chunks.hash = chunks.hash)""")
+        self.db.commit()
+
+    def prune(self, filename, keep, max_age):
+        """Remove all but the newest keep backups of filename, and any older
+        than max_age days. The newest backup is always kept."""
+        oldest = time.time() - max_age * 24 * 60 * 60
+        drop = [x[0] for i, x in enumerate(self.list_backups(filename))
+                if i > 0 and (i >= keep or x[2] < oldest)]
+        if len(drop) > 0:
+            self.remove(drop)
+        return len(drop)
+
+    def total_size(self):
+        """Return (bytes of backups as files, bytes actually stored)."""
+        c = self.db.cursor()
+        c.execute("select coalesce(sum(size), 0) from snapshots")
+        files = c.fetchone()[0]
+        c.execute("select coalesce(sum(length(data)), 0) from chunks")
+        return files, c.fetchone()[0]
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Headless batch editor for .player files
+
+Applies the same edits to many player saves at once from the command line,
+without loading Qt. Folders are searched for .player files, like this:
+$ python ./batch.py --pixels 5000 --clear-new-blueprints ~/starbound/player
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import saves
+
+
+class BatchError(Exception):
+    pass
+
+
+# edits. these all take a PlayerSave as the first argument and must be
+# module level functions so they can be sent to worker processes
+def set_pixels(player, pixels):
+    player.set_pixels(pixels)
+
+
+def add_blueprints(player, names):
+    known = player.get_blueprints()
+    have = set(x["name"] for x in known if x is not None)
+    for name in names:
+        if name not in have:
+            known.append(saves.new_item_data(name))
+            have.add(name)
+    player.set_blueprints(known)
+
+
+def clear_new_blueprints(player):
+    player.clear_new_blueprints()
+
+
+def give_item(player, name, count):
+    bag = player.get_main_bag()
+    for i in range(len(bag)):
+        if bag[i] is None:
+            bag[i] = saves.new_item(name, count)
+            player.set_main_bag(bag)
+            return
+    raise BatchError("No room in main bag for %s" % name)
+
+
+def parse_item(value):
+    """Turn NAME[:COUNT] into a (name, count) tuple."""
+    name, sep, count = value.partition(":")
+    try:
+        return name, int(count) if sep else 1
+    except ValueError:
+        raise argparse.ArgumentTypeError("Invalid item count: %s" % value)
+
+
+def find_players(paths):
+    """Expand any folders in paths to the .player files inside them."""
+    players = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith(".player"):
+                    players.append(os.path.join(path, name))
+        else:
+            players.append(path)
+    return players
+
+
+def edit_player(filename, edits, dry_run=False):
+    """Apply a list of (function, args) edits to one player file and return
+    (filename, bytes read, error message or None)."""
+    player = None
+    try:
+        size = os.path.getsize(filename)
+        player = saves.PlayerSave(filename, lazy=True)
+        for func, args in edits:
+            func(player, *args)
+        if not dry_run:
+            # written to a temp file and swapped in
+            player.export_save(filename)
+        return filename, size, None
+    except Exception as e:
+        logging.debug("Unable to edit %s", filename, exc_info=True)
+        return filename, 0, "%s: %s" % (type(e).__name__, e)
+    finally:
+        if player is not None:
+            player.close()
+
+
+def run(players, edits, jobs=None, dry_run=False):
+    """Edit every player file over a pool of jobs processes, yielding
+    results as they finish."""
+    if jobs == 1:
+        for filename in players:
+            yield edit_player(filename, edits, dry_run)
+        return
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(edit_player, x, edits, dry_run)
+                   for x in players]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def build_edits(args):
+    edits = []
+    if args.pixels is not None:
+        edits.append((set_pixels, (args.pixels,)))
+    if args.blueprint:
+        edits.append((add_blueprints, (args.blueprint,)))
+    if args.clear_new_blueprints:
+        edits.append((clear_new_blueprints, ()))
+    for name, count in args.give or ():
+        edits.append((give_item, (name, count)))
+    return edits
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Apply the same edits to many Starbound player files.")
+    parser.add_argument("paths", nargs="+", metavar="path",
+                        help=".player file or folder of them")
+    parser.add_argument("--pixels", type=int,
+                        help="set pixels to this amount")
+    parser.add_argument("--blueprint", action="append", metavar="NAME",
+                        help="grant a blueprint, can be repeated")
+    parser.add_argument("--clear-new-blueprints", action="store_true",
+                        help="clear the new blueprints list")
+    parser.add_argument("--give", action="append", type=parse_item,
+                        metavar="NAME[:COUNT]",
+                        help="put an item in the main bag, can be repeated")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="number of processes (default: one per CPU)")
+    parser.add_argument("-n", "--dry-run", action="store_true",
+                        help="apply the edits but don't write anything")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(levelname)-8s %(message)s")
+
+    edits = build_edits(args)
+    if len(edits) == 0:
+        parser.error("no edits given")
+
+    players = find_players(args.paths)
+    start = time.perf_counter()
+    total_bytes = 0
+    errors = 0
+    for filename, size, error in run(players, edits, args.jobs, args.dry_run):
+        if error is None:
+            total_bytes += size
+            logging.debug("Edited %s", filename)
+        else:
+            errors += 1
+            logging.error("%s: %s", filename, error)
+    taken = max(time.perf_counter() - start, 1e-6)
+
+    done = len(players) - errors
+    logging.info("Edited %d of %d files in %.2fs (%.1f files/s, %.1f MB/s)",
+                 done, len(players), taken, done / taken,
+                 total_bytes / taken / 1024 / 1024)
+    return 1 if errors > 0 else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -22,6 +22,7 @@ STARCHEAT_VERSION = "0.27.1 (Glad Giraffe)"
 STARCHEAT_VERSION_TAG = "0.27.1"
 CONFIG_VERSION = 15
 ini_file = os.path.join(config_folder, "starcheat.ini")
+save_cache_file = os.path.join(config_folder, "saves.db")
 
 
 class Config(object):
@@ -58,6 +59,10 @@ class Config(object):
         player_folder = os.path.join(starbound_folder, storage_folder, "player")
         mods_folder = os.path.join(starbound_folder, storage_folder, "mods")
         backup_folder = os.path.join(config_folder, "backups")
+        auto_backup = "yes"
+        backup_compression = "dedup"
+        backup_keep = 10
+        backup_max_age = 30
         pak_hash = "none"
         check_updates = "yes"
         assets_db = os.path.join(config_folder, "assets.db")
@@ -68,6 +73,10 @@ class Config(object):
             "player_folder": player_folder,
             "mods_folder": mods_folder,
             "backup_folder": backup_folder,
+            "auto_backup": auto_backup,
+            "backup_compression": backup_compression,
+            "backup_keep": backup_keep,
+            "backup_max_age": backup_max_age,
             "pak_hash": pak_hash,
             "assets_db": assets_db,
             "check_updates": check_updates,
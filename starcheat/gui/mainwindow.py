@@ -4,7 +4,6 @@ Main application window for starcheat GUI
 
 import sys
 import logging
-import json
 
 from PyQt5 import QtWidgets
 from PyQt5 import QtCore
@@ -22,6 +21,8 @@ from PIL.ImageQt import ImageQt
 from threading import Thread
 
 import saves
+import savejson
+import backups
 import qt_mainwindow
 from assets.core import Assets
 from config import Config
@@ -337,6 +338,7 @@ class MainWindow():
         """Update internal player dict with GUI values and export to file."""
         logging.info("Saving player file %s", self.player.filename)
         self.set_bags()
+        self.backup_player()
         # save and show status
         logging.info("Writing file to disk")
         self.player.export_save(self.player.filename)
@@ -345,6 +347,25 @@ class MainWindow():
         self.window.setWindowModified(False)
         self.players[self.player.get_uuid()] = self.player
 
+    def backup_player(self):
+        """Start a compressed backup of the player file about to be saved
+        over, if they're turned on."""
+        config = Config()
+
+        def option(name, default):
+            return config.read(name) if config.has_key(name) else default
+
+        if option("auto_backup", "yes") != "yes":
+            return
+        try:
+            backups.backup_file(
+                self.player.filename, config.read("backup_folder"),
+                option("backup_compression", backups.default_compression),
+                int(option("backup_keep", backups.default_keep)),
+                float(option("backup_max_age", backups.default_max_age)))
+        except (ValueError, backups.BackupError):
+            logging.exception("Unable to back up player file")
+
     def new_item_edit(self, bag, do_import, json_edit=False):
         """Display a new item edit dialog using the select cell in a given bag."""
         logging.debug("New item edit dialog")
@@ -574,7 +595,6 @@ class MainWindow():
 
     def export_json(self, kind="player"):
         """Export player entity as json."""
-        data = self.player.entity
         title = "Export Player JSON File As"
         filetype = "JSON (*.json);;All Files (*)"
         status = "Exported player JSON file to "
@@ -583,11 +603,7 @@ class MainWindow():
 
         if filename[0] != "":
             self.set_bags()
-            json_data = json.dumps(data, sort_keys=True,
-                                   indent=4, separators=(',', ': '))
-            json_file = open(filename[0], "w")
-            json_file.write(json_data)
-            json_file.close()
+            savejson.export_json(self.player, filename[0])
             self.ui.statusbar.showMessage(status + filename[0], 3000)
 
     # import save stuff
@@ -613,7 +629,7 @@ class MainWindow():
 
     def import_json(self, kind="player"):
         """Import an exported JSON file and merge/update with open player."""
-        update_func = lambda: self.player.entity.update(data)
+        update_func = lambda: savejson.import_json(self.player, filename[0])
         title = "Import JSON Player File"
         status = "Imported player file "
 
@@ -625,7 +641,6 @@ class MainWindow():
             return
 
         try:
-            data = json.load(open(filename[0], "r"))
             update_func()
             self.update()
             self.ui.statusbar.showMessage(status + filename[0], 3000)
@@ -3,6 +3,7 @@ Open player save file dialog
 """
 
 import os
+import io
 import logging
 import shutil
 import datetime
@@ -15,11 +16,14 @@ from PyQt5.QtGui import QPixmap
 from PyQt5 import QtCore
 from PyQt5 import QtGui
 
+from PIL import Image
 from PIL.ImageQt import ImageQt
 
 import saves
+import config
 import qt_openplayer
 from config import Config
+from savecache import SaveCache
 from gui.utils import new_setup_dialog
 
 
@@ -52,7 +56,8 @@ class CharacterSelectDialog():
         self.dialog.accepted.connect(self.accept)
         self.ui.player_list.itemDoubleClicked.connect(self.dialog.accept)
         self.ui.trash_button.clicked.connect(self.trash_player)
-        self.ui.refresh_button.clicked.connect(self.get_players)
+        # refreshing checks cached saves against the real files
+        self.ui.refresh_button.clicked.connect(lambda: self.get_players(True))
 
         if self.players is None:
             self.get_players()
@@ -67,11 +72,26 @@ class CharacterSelectDialog():
         except AttributeError:
             player = ""
 
-        if player != "":
-            self.selected = self.players[player]["player"]
-            self.dialog.close()
+        if player == "":
+            return
 
-    def get_players(self):
+        # the list only holds partially read saves, load the real thing
+        filename = self.players[player]["player"].filename
+        try:
+            self.selected = saves.PlayerSave(filename)
+        except saves.WrongSaveVer:
+            logging.exception("Save file %s is not compatible", filename)
+            dialog = QMessageBox(self.dialog)
+            dialog.setWindowTitle("Unable to Open Player")
+            dialog.setText("This player file could not be read.")
+            dialog.setInformativeText(filename)
+            dialog.setIcon(QMessageBox.Critical)
+            dialog.exec()
+            return
+
+        self.dialog.close()
+
+    def get_players(self, validate=False):
         players_found = {}
 
         try:
@@ -99,12 +119,12 @@ class CharacterSelectDialog():
         progress.forceShow()
         progress.setValue(total)
 
+        cache = SaveCache(config.save_cache_file, Config().read("pak_hash"))
         try:
             for f in player_files:
                 try:
-                    player = saves.PlayerSave(os.path.join(self.player_folder, f))
+                    player, preview = self.read_player(cache, f, validate)
                     uuid = player.get_uuid()
-                    preview = self.assets.species().render_player(player)
                     players_found[uuid] = {}
                     players_found[uuid]["player"] = player
                     players_found[uuid]["preview"] = preview
@@ -114,10 +134,30 @@ class CharacterSelectDialog():
                 progress.setValue(total)
         except FileNotFoundError:
             logging.exception("Could not open %s", self.player_folder)
+        finally:
+            cache.close()
 
         self.players = players_found
         self.populate()
 
+    def read_player(self, cache, f, validate=False):
+        """Return a partially read player and its preview image, from the
+        save cache if the file hasn't changed."""
+        filename = os.path.join(self.player_folder, f)
+        cached = cache.get(filename, validate)
+        if cached is not None:
+            entity, png = cached
+            player = saves.PlayerSave(filename, saves.summary_keys,
+                                      entity=entity)
+            return player, Image.open(io.BytesIO(png))
+
+        player = saves.PlayerSave(filename, saves.summary_keys)
+        preview = self.assets.species().render_player(player)
+        png = io.BytesIO()
+        preview.save(png, "PNG")
+        cache.put(filename, player.entity, png.getvalue())
+        return player, preview
+
     def populate(self):
         total = 0
         self.ui.player_list.clear()
@@ -46,7 +46,9 @@ def make_pak_hash():
     return final_hash.hexdigest()
 
 
-def build_assets_db(parent):
+def build_assets_db(parent, full=True):
+    """Index the Starbound assets. Unless full is set only the vanilla or mod
+    sources that changed since they were last indexed are done again."""
     assets_db_file = Config().read("assets_db")
     starbound_folder = Config().read("starbound_folder")
     assets_db = Assets(assets_db_file, starbound_folder)
@@ -60,18 +62,20 @@ def build_assets_db(parent):
         dialog.exec()
         assets_db.db.close()
 
-    assets_db.init_db()
-    asset_files = assets_db.find_assets()
+    if full:
+        assets_db.init_db()
+    rebuild, changes = assets_db.find_changes()
+    scanned = assets_db.scan_changes(changes)
     total = 0
     progress = QProgressDialog("Indexing Starbound assets...",
-                               "Abort", 0, len(asset_files),
+                               "Abort", 0, sum(len(x[2]) for x in scanned),
                                parent)
     progress.setWindowTitle("Indexing...")
     progress.setWindowModality(QtCore.Qt.ApplicationModal)
     progress.forceShow()
     progress.setValue(total)
 
-    for i in assets_db.create_index():
+    for i in assets_db.update_index(scanned, full or rebuild):
         total += 1
         progress.setValue(total)
         if progress.wasCanceled():
@@ -79,7 +83,7 @@ def build_assets_db(parent):
             return False
 
     progress.hide()
-    if total == 0:
+    if assets_db.total_indexed() == 0:
         bad_asset_dialog()
         return False
     else:
@@ -88,10 +92,12 @@ def build_assets_db(parent):
 
 
 def check_index_valid(parent):
-    old_hash = Config().read("pak_hash")
-    new_hash = make_pak_hash()
-    if old_hash != new_hash:
-        logging.info("Hashes don't match, updating index")
+    assets_db = Assets(Config().read("assets_db"),
+                       Config().read("starbound_folder"))
+    full, changes = assets_db.find_changes()
+    assets_db.db.close()
+    if len(changes) > 0:
+        logging.info("%d asset sources changed, updating index", len(changes))
         dialog = QMessageBox(parent)
         dialog.setWindowTitle("Assets Out-of-date")
         dialog.setText("Starbound assets have been changed.")
@@ -100,7 +106,7 @@ def check_index_valid(parent):
         dialog.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
         answer = dialog.exec()
         if answer == QMessageBox.Yes:
-            return build_assets_db(parent)
+            return build_assets_db(parent, False)
         else:
             return True
     else:
@@ -0,0 +1,221 @@
+"""
+Persistent cache of partially decoded player saves
+
+Keeps the summary entity and rendered preview of each player file in an
+sqlite db, so the character select dialog only has to decode saves that
+changed since it last saw them.
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+
+import saves
+
+# bump this if the layout of the cache table changes
+cache_version = 1
+# total bytes of summaries and previews kept before old entries are evicted
+default_max_size = 32 * 1024 * 1024
+
+
+def hash_file(filename):
+    content_hash = hashlib.sha1()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+class SaveCache(object):
+    """Entries are keyed by path and only used if the file's size and mtime
+    still match. assets_hash should change whenever the assets used to
+    render previews do (ie. the pak hash), it invalidates everything.
+
+    It's only there to save time, so it never fails. A corrupt cache is
+    deleted and made again, and once the db can't be used everything is a
+    miss."""
+    def __init__(self, db_file, assets_hash="", max_size=default_max_size):
+        self.db_file = db_file
+        self.assets_hash = assets_hash
+        self.max_size = max_size
+        self.db = None
+        self.open_db()
+
+    def open_db(self):
+        try:
+            self.connect()
+        except sqlite3.OperationalError:
+            # locked or can't be opened, leave it for next time
+            logging.exception("Unable to open save cache %s", self.db_file)
+            self.disable()
+        except sqlite3.DatabaseError:
+            logging.exception("Save cache %s is corrupt, making a new one",
+                              self.db_file)
+            self.disable()
+            try:
+                os.remove(self.db_file)
+                self.connect()
+            except (OSError, sqlite3.Error):
+                logging.exception("Unable to make a new save cache %s",
+                                  self.db_file)
+                self.disable()
+
+    def connect(self):
+        # it's quicker to go without than to wait long for a lock
+        self.db = sqlite3.connect(self.db_file, timeout=1)
+        self.init_db()
+
+    def disable(self):
+        if self.db is not None:
+            try:
+                self.db.close()
+            except sqlite3.Error:
+                pass
+        self.db = None
+
+    def failed(self, msg, *args):
+        """Log an error from the db and stop using it, so a locked cache
+        doesn't hold up every save it's asked about."""
+        logging.exception(msg, *args)
+        self.disable()
+
+    def init_db(self):
+        c = self.db.cursor()
+        if c.execute("pragma user_version").fetchone()[0] != cache_version:
+            c.execute("drop table if exists saves")
+            c.execute("pragma user_version = %d" % cache_version)
+        c.execute("""create table if not exists saves
+        (path text primary key, size integer, mtime_ns integer, hash text,
+         assets_hash text, summary blob, preview blob, used real)""")
+        self.db.commit()
+
+    def get(self, filename, validate=False):
+        """Return a cached (summary entity, preview png) for filename, or None
+        if it's not cached or the file has changed. With validate set the
+        file's content hash is checked too."""
+        if self.db is None:
+            return None
+        path = os.path.abspath(filename)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        c = self.db.cursor()
+        try:
+            c.execute("""select size, mtime_ns, hash, assets_hash, summary,
+            preview from saves where path = ?""", (path,))
+            row = c.fetchone()
+        except sqlite3.Error:
+            self.failed("Unable to read save cache %s", self.db_file)
+            return None
+        if row is None:
+            return None
+
+        size, mtime_ns, content_hash, assets_hash, summary, preview = row
+        stale = (size != stat.st_size or mtime_ns != stat.st_mtime_ns or
+                 assets_hash != self.assets_hash or
+                 (validate and content_hash != hash_file(path)))
+        if stale:
+            self.remove(path)
+            return None
+
+        try:
+            entity = saves.read_variant(summary, 0)[0]
+        except Exception:
+            logging.exception("Unable to read cached save %s", path)
+            self.remove(path)
+            return None
+
+        # committed along with the next change, or on close
+        try:
+            c.execute("update saves set used = ? where path = ?",
+                      (time.time(), path))
+        except sqlite3.Error:
+            self.failed("Unable to update save cache %s", self.db_file)
+        return entity, preview
+
+    def validate(self, filename):
+        """Check a cached entry against the real file's contents, dropping it
+        if they differ."""
+        return self.get(filename, True) is not None
+
+    def put(self, filename, entity, preview):
+        """Cache a summary entity and preview png for filename."""
+        if self.db is None:
+            return
+        path = os.path.abspath(filename)
+        try:
+            stat = os.stat(path)
+            content_hash = hash_file(path)
+        except OSError:
+            logging.exception("Unable to cache save %s", path)
+            return
+
+        summary = saves.pack_variant(entity)
+        if preview is None:
+            preview = b""
+        c = self.db.cursor()
+        try:
+            c.execute("insert or replace into saves values (?, ?, ?, ?, ?, ?, ?, ?)",
+                      (path, stat.st_size, stat.st_mtime_ns, content_hash,
+                       self.assets_hash, summary, preview, time.time()))
+            self.evict()
+            self.db.commit()
+        except sqlite3.Error:
+            self.failed("Unable to cache save %s", path)
+
+    def remove(self, filename):
+        if self.db is None:
+            return
+        c = self.db.cursor()
+        try:
+            c.execute("delete from saves where path = ?",
+                      (os.path.abspath(filename),))
+            self.db.commit()
+        except sqlite3.Error:
+            self.failed("Unable to remove %s from save cache", filename)
+
+    def total_size(self):
+        c = self.db.cursor()
+        c.execute("""select coalesce(sum(length(summary) + length(preview)), 0)
+        from saves""")
+        return c.fetchone()[0]
+
+    def evict(self):
+        """Drop the least recently used entries until the cache fits in
+        max_size."""
+        total = self.total_size()
+        if total <= self.max_size:
+            return
+        c = self.db.cursor()
+        c.execute("""select path, length(summary) + length(preview) from saves
+        order by used""")
+        drop = []
+        for path, size in c.fetchall():
+            if total <= self.max_size:
+                break
+            drop.append((path,))
+            total -= size
+        c.executemany("delete from saves where path = ?", drop)
+        logging.debug("Evicted %d saves from cache", len(drop))
+
+    def clear(self):
+        if self.db is None:
+            return
+        try:
+            self.db.execute("delete from saves")
+            self.db.commit()
+        except sqlite3.Error:
+            self.failed("Unable to clear save cache %s", self.db_file)
+
+    def close(self):
+        if self.db is None:
+            return
+        try:
+            self.db.commit()
+        except sqlite3.Error:
+            logging.exception("Unable to update save cache %s", self.db_file)
+        self.disable()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Structural diff between two player saves
+
+Reports every added, removed and changed value as a path into the entity,
+like inventory.bag[12].content.count:
+$ python ./savediff.py old.player new.player
+
+Saves are compared on their encoded bytes wherever possible, so identical
+subtrees are stepped over without being decoded.
+"""
+
+import sys
+
+import saves
+from saves import read_vlq, read_vlq_str, read_variant, skip_variant
+
+
+def format_path(path):
+    """Turn a list of dict keys and list indexes into a dotted path."""
+    text = ""
+    for part in path:
+        if type(part) is int:
+            text += "[%d]" % part
+        elif text == "":
+            text = part
+        else:
+            text += "." + part
+    return text
+
+
+def common_prefix(a, b, a_start=0, b_start=0):
+    """Return how many bytes are the same in a and b from the given
+    offsets on."""
+    length = min(len(a) - a_start, len(b) - b_start)
+    same = 0
+    step = 4096
+    while same < length:
+        end = min(same + step, length)
+        if a[a_start+same:a_start+end] == b[b_start+same:b_start+end]:
+            same = end
+            step *= 2
+        elif step == 1:
+            break
+        else:
+            step //= 2
+    return same
+
+
+def common_suffix(a, b):
+    """Return how many bytes a and b end with in common."""
+    length = min(len(a), len(b))
+    a_end = len(a)
+    b_end = len(b)
+    same = 0
+    step = 4096
+    while same < length:
+        end = min(same + step, length)
+        if a[a_end-end:a_end-same] == b[b_end-end:b_end-same]:
+            same = end
+            step *= 2
+        elif step == 1:
+            break
+        else:
+            step //= 2
+    return same
+
+
+class DataDiff(object):
+    """Diff variants in two encoded buffers.
+
+    A variant that ends before the next differing byte can't have changed,
+    so it's skipped without being decoded. Containers are only walked when
+    they hold a change. Once the rest of both buffers is the same nothing
+    after can differ either, so that stops the diff altogether."""
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+        self.suffix = common_suffix(old, new)
+        self.changes = []
+        # the last run of matching bytes found, as (new offset - old offset,
+        # old start, old end)
+        self.run = (0, 0, 0)
+        # number of containers being walked that don't have the same number
+        # of items left in both, the rest of the data can only be compared
+        # when there's none
+        self.misaligned = 0
+
+    def rest_same(self, old_offset, new_offset):
+        rest = len(self.old) - old_offset
+        return (self.misaligned == 0 and rest == len(self.new) - new_offset
+                and rest <= self.suffix)
+
+    def same_length(self, old_offset, new_offset):
+        """Return how many bytes are the same in both from these offsets."""
+        shift, start, end = self.run
+        if new_offset - old_offset == shift and start <= old_offset < end:
+            return end - old_offset
+        length = common_prefix(self.old, self.new, old_offset, new_offset)
+        self.run = (new_offset - old_offset, old_offset, old_offset + length)
+        return length
+
+    def changed(self, kind, path, old_value=None, new_value=None):
+        self.changes.append((kind, format_path(path), old_value, new_value))
+
+    def variant(self, path, old_offset, new_offset):
+        """Diff the variants at the given offsets and return the offsets
+        just past them, or None if nothing after them can differ."""
+        if self.rest_same(old_offset, new_offset):
+            return None
+
+        old_type = self.old[old_offset]
+        new_type = self.new[new_offset]
+        container = old_type == new_type and old_type in (6, 7)
+
+        # only skip as far as the next differing byte. if it's in this
+        # container walk it instead of skipping the whole thing
+        same = old_offset + self.same_length(old_offset, new_offset)
+        end = skip_variant(self.old, old_offset, same)
+        if end is not None and end <= same:
+            return end, new_offset + end - old_offset
+        elif container:
+            return self.container(path, old_type, old_offset, new_offset)
+
+        self.changed("changed", path,
+                     read_variant(self.old, old_offset)[0],
+                     read_variant(self.new, new_offset)[0])
+        return (skip_variant(self.old, old_offset),
+                skip_variant(self.new, new_offset))
+
+    def container(self, path, variant_type, old_offset, new_offset):
+        if variant_type == 7:
+            return self.dict(path, old_offset + 1, new_offset + 1)
+        else:
+            return self.list(path, old_offset + 1, new_offset + 1)
+
+    def list(self, path, old_offset, new_offset):
+        old_total, old_offset = read_vlq(self.old, old_offset)
+        new_total, new_offset = read_vlq(self.new, new_offset)
+        aligned = old_total == new_total
+        if not aligned:
+            self.misaligned += 1
+        for i in range(min(old_total, new_total)):
+            ends = self.variant(path + [i], old_offset, new_offset)
+            if ends is None:
+                return None
+            old_offset, new_offset = ends
+        if not aligned:
+            self.misaligned -= 1
+
+        for i in range(new_total, old_total):
+            value, old_offset = read_variant(self.old, old_offset)
+            self.changed("removed", path + [i], value)
+        for i in range(old_total, new_total):
+            value, new_offset = read_variant(self.new, new_offset)
+            self.changed("added", path + [i], None, value)
+        return old_offset, new_offset
+
+    def dict(self, path, old_offset, new_offset):
+        old_total, old_offset = read_vlq(self.old, old_offset)
+        new_total, new_offset = read_vlq(self.new, new_offset)
+
+        # keys are nearly always in the same order, go through them together
+        # until they aren't
+        aligned = old_total == new_total
+        if not aligned:
+            self.misaligned += 1
+        done = 0
+        while done < old_total and done < new_total:
+            old_key, old_value = read_vlq_str(self.old, old_offset)
+            new_key, new_value = read_vlq_str(self.new, new_offset)
+            if old_key != new_key:
+                break
+            ends = self.variant(path + [old_key], old_value, new_value)
+            if ends is None:
+                return None
+            old_offset, new_offset = ends
+            done += 1
+
+        # whatever's left is compared by key
+        if aligned:
+            self.misaligned += 1
+
+        old_rest, old_offset = self.dict_spans(self.old, old_offset,
+                                               old_total - done)
+        new_rest, new_offset = self.dict_spans(self.new, new_offset,
+                                               new_total - done)
+        for key, offset in old_rest.items():
+            if key not in new_rest:
+                self.changed("removed", path + [key],
+                             read_variant(self.old, offset)[0])
+            else:
+                self.variant(path + [key], offset, new_rest[key])
+        for key, offset in new_rest.items():
+            if key not in old_rest:
+                self.changed("added", path + [key], None,
+                             read_variant(self.new, offset)[0])
+        self.misaligned -= 1
+        return old_offset, new_offset
+
+    def dict_spans(self, data, offset, total):
+        spans = {}
+        for i in range(total):
+            key, offset = read_vlq_str(data, offset)
+            spans[key] = offset
+            offset = skip_variant(data, offset)
+        return spans, offset
+
+
+def diff_values(old, new, path=None, changes=None):
+    """Diff two decoded variants, returns a list of (kind, path, old value,
+    new value) where kind is "added", "removed" or "changed"."""
+    if path is None:
+        path = []
+    if changes is None:
+        changes = []
+
+    if saves.same_variant(old, new):
+        pass
+    elif type(old) is dict and type(new) is dict:
+        for key in old:
+            if key not in new:
+                changes.append(("removed", format_path(path + [key]),
+                                old[key], None))
+            else:
+                diff_values(old[key], new[key], path + [key], changes)
+        for key in new:
+            if key not in old:
+                changes.append(("added", format_path(path + [key]),
+                                None, new[key]))
+    elif type(old) is list and type(new) is list:
+        for i in range(min(len(old), len(new))):
+            diff_values(old[i], new[i], path + [i], changes)
+        for i in range(len(new), len(old)):
+            changes.append(("removed", format_path(path + [i]), old[i], None))
+        for i in range(len(old), len(new)):
+            changes.append(("added", format_path(path + [i]), None, new[i]))
+    else:
+        changes.append(("changed", format_path(path), old, new))
+    return changes
+
+
+def entity_offset(data):
+    """Return the offset of the entity variant in a whole save file."""
+    header, offset = saves.read_var(saves.data_format[0], data, 0)
+    if saves.unpack_str(header) != saves.data_version:
+        raise saves.WrongSaveVer("Wrong save format version")
+    return saves.read_starsave_header(data, offset)[1]
+
+
+def diff_data(old, new):
+    """Diff the entities of two whole save files given as bytes."""
+    diff = DataDiff(old, new)
+    diff.variant([], entity_offset(old), entity_offset(new))
+    return diff.changes
+
+
+def diff_saves(old, new):
+    """Diff the entities of two PlayerSaves. Top level keys that haven't been
+    changed since they were read are compared on their saved bytes."""
+    if (old.raw is not None and new.raw is not None and
+            all(old.is_clean(k) for k in old.entity) and
+            all(new.is_clean(k) for k in new.entity)):
+        return diff_data(old.raw, new.raw)
+
+    changes = []
+    diff = None
+    if old.raw is not None and new.raw is not None:
+        diff = DataDiff(old.raw, new.raw)
+    for key in old.entity:
+        if key not in new.entity:
+            changes.append(("removed", key, old.peek(key), None))
+        elif diff is not None and old.is_clean(key) and new.is_clean(key):
+            diff.variant([key], old.spans[key][0], new.spans[key][0])
+        else:
+            diff_values(old.peek(key), new.peek(key), [key], changes)
+    for key in new.entity:
+        if key not in old.entity:
+            changes.append(("added", key, None, new.peek(key)))
+    if diff is not None:
+        changes += diff.changes
+    return changes
+
+
+def diff_files(old_filename, new_filename):
+    with open(old_filename, "rb") as f:
+        old = f.read()
+    with open(new_filename, "rb") as f:
+        new = f.read()
+    return diff_data(old, new)
+
+
+def short_repr(value, limit=60):
+    text = repr(value)
+    if len(text) > limit:
+        text = text[:limit-3] + "..."
+    return text
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.stderr.write("usage: savediff.py old.player new.player\n")
+        return 2
+
+    changes = diff_files(sys.argv[1], sys.argv[2])
+    for kind, path, old_value, new_value in changes:
+        if kind == "added":
+            print("+ %s: %s" % (path, short_repr(new_value)))
+        elif kind == "removed":
+            print("- %s: %s" % (path, short_repr(old_value)))
+        else:
+            print("~ %s: %s -> %s" % (path, short_repr(old_value),
+                                      short_repr(new_value)))
+    return 1 if len(changes) > 0 else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
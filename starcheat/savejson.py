@@ -0,0 +1,207 @@
+"""
+Stream player entities to and from JSON
+
+Exports are written one top level key at a time while walking the decoded
+values, and imports are encoded straight from the JSON text into variant
+bytes without building the decoded values first. Either way only about one
+copy of the save is held in memory.
+"""
+
+import json
+import re
+
+from json.decoder import scanstring
+
+import saves
+
+try:
+    from json.decoder import JSONDecodeError
+except ImportError:
+    # before python 3.5 json raised plain ValueErrors
+    class JSONDecodeError(ValueError):
+        def __init__(self, msg, doc, pos):
+            ValueError.__init__(self, "%s: char %d" % (msg, pos))
+            self.msg = msg
+            self.doc = doc
+            self.pos = pos
+
+# same layout the old whole entity json.dumps export used
+json_indent = 4
+json_encoder = json.JSONEncoder(sort_keys=True, indent=json_indent,
+                                separators=(",", ": "))
+
+whitespace = re.compile(r"[ \t\n\r]*")
+number = re.compile(r"(-?(?:0|[1-9]\d*))(\.\d+)?([eE][-+]?\d+)?")
+
+# the few values that aren't numbers or strings, as their encoded variants
+constants = (
+    ("null", b"\x01"),
+    ("true", b"\x03\x01"),
+    ("false", b"\x03\x00"),
+    ("NaN", b"\x02" + saves.double_struct.pack(float("nan"))),
+    ("Infinity", b"\x02" + saves.double_struct.pack(float("inf"))),
+    ("-Infinity", b"\x02" + saves.double_struct.pack(float("-inf")))
+)
+
+
+def write_json(entity, f):
+    """Write an entity to the text file f as JSON, one top level key at a
+    time. Keys that aren't decoded yet are decoded just long enough to be
+    written."""
+    indent = "\n" + " " * json_indent
+    read = entity.read if isinstance(entity, saves.SaveEntity) else entity.get
+    keys = sorted(entity)
+
+    f.write("{")
+    for i, key in enumerate(keys):
+        f.write(indent if i == 0 else "," + indent)
+        f.write(json.dumps(key) + ": ")
+        # strings can't hold a raw newline, so this only hits the layout
+        for chunk in json_encoder.iterencode(read(key)):
+            f.write(chunk.replace("\n", indent))
+    f.write("\n}" if len(keys) > 0 else "}")
+
+
+class JsonTranscoder(object):
+    """Encode JSON text into variants without decoding it to python values
+    first.
+
+    Numbers with a fraction or exponent become doubles and the rest become
+    ints, the same as json.loads() and then encoding would give."""
+    def __init__(self, text, encoder):
+        self.text = text
+        self.encoder = encoder
+
+    def skip_space(self, offset):
+        return whitespace.match(self.text, offset).end()
+
+    def expect(self, char, offset):
+        offset = self.skip_space(offset)
+        if not self.text.startswith(char, offset):
+            raise JSONDecodeError("Expecting '%s'" % char, self.text, offset)
+        return offset + 1
+
+    def string(self, offset):
+        """Return the string starting at offset and the offset past it."""
+        offset = self.skip_space(offset)
+        if not self.text.startswith('"', offset):
+            raise JSONDecodeError("Expecting string", self.text, offset)
+        return scanstring(self.text, offset + 1)
+
+    def value(self, offset):
+        """Encode the JSON value at offset and return the offset past it."""
+        offset = self.skip_space(offset)
+        text = self.text
+        buf = self.encoder.buf
+        char = text[offset:offset+1]
+
+        if char == '"':
+            value, offset = scanstring(text, offset + 1)
+            buf.append(5)
+            self.encoder.write_vlq_str(value)
+            return offset
+        elif char == "{":
+            buf.append(7)
+            return self.container(offset + 1, "}", self.dict_item)
+        elif char == "[":
+            buf.append(6)
+            return self.container(offset + 1, "]", self.value)
+
+        match = number.match(text, offset)
+        if match is not None:
+            integer, fraction, exponent = match.groups()
+            if fraction or exponent:
+                buf.append(2)
+                buf += saves.double_struct.pack(float(match.group()))
+            else:
+                buf.append(4)
+                self.encoder.write_vlqs(int(integer))
+            return match.end()
+
+        for name, encoded in constants:
+            if text.startswith(name, offset):
+                buf += encoded
+                return offset + len(name)
+        raise JSONDecodeError("Expecting value", text, offset)
+
+    def dict_item(self, offset):
+        key, offset = self.string(offset)
+        self.encoder.write_key(key)
+        return self.value(self.expect(":", offset))
+
+    def container(self, offset, close, item):
+        """Encode the items of a list or dict up to close. The item count
+        goes before them, so it's put in once they've all been written."""
+        buf = self.encoder.buf
+        start = len(buf)
+        count = 0
+        offset = self.skip_space(offset)
+        if self.text.startswith(close, offset):
+            buf.append(0)
+            return offset + 1
+
+        while True:
+            offset = self.skip_space(item(offset))
+            count += 1
+            if self.text.startswith(close, offset):
+                break
+            elif not self.text.startswith(",", offset):
+                raise JSONDecodeError("Expecting ',' delimiter", self.text,
+                                      offset)
+            offset += 1
+
+        buf[start:start] = saves.pack_vlq(count)
+        return offset + 1
+
+    def entity(self):
+        """Encode each top level value of a JSON object on its own, yielding
+        (key, encoded variant) pairs."""
+        offset = self.expect("{", 0)
+        if self.text.startswith("}", self.skip_space(offset)):
+            offset = self.skip_space(offset) + 1
+        else:
+            while True:
+                key, offset = self.string(offset)
+                offset = self.value(self.expect(":", offset))
+                yield key, bytes(self.encoder.buf)
+                del self.encoder.buf[:]
+
+                offset = self.skip_space(offset)
+                if self.text.startswith("}", offset):
+                    offset += 1
+                    break
+                offset = self.expect(",", offset)
+
+        if self.skip_space(offset) != len(self.text):
+            raise JSONDecodeError("Extra data", self.text,
+                                  self.skip_space(offset))
+
+
+def read_json(text):
+    """Encode a JSON object, yielding (key, encoded variant) pairs for each
+    of its top level keys."""
+    return JsonTranscoder(text, saves.SaveEncoder()).entity()
+
+
+def export_json(player, filename):
+    """Write a PlayerSave's entity to a JSON file."""
+    with open(filename, "w") as f:
+        write_json(player.entity, f)
+
+
+def import_json(player, filename):
+    """Merge the top level keys of a JSON file into a PlayerSave's entity.
+    Keys that decode to exactly what's already saved are left untouched."""
+    with open(filename, "r") as f:
+        text = f.read()
+
+    # check it's all valid before changing anything
+    encoded = list(read_json(text))
+    del text
+
+    entity = player.entity
+    for key, value in encoded:
+        if isinstance(entity, saves.SaveEntity):
+            entity.set_encoded(key, value)
+        else:
+            entity[key] = saves.read_variant(value, 0)[0]
@@ -10,11 +10,17 @@ $ python ./save_file.py <.player file>
 
 import sys
 import logging
+import tempfile
 import struct
 import os
 import math
+import json
+import mmap
+import copy
+import shutil
 
 from pprint import pprint
+from collections.abc import MutableMapping
 from struct import pack, unpack_from
 
 # compatible save version
@@ -31,6 +37,21 @@ data_format = (
     ("save", "__starsave__", None),
     ("the_rest", "__the_rest__", None)
 )
+# bump this if the layout of saved key offset indexes changes
+index_version = 1
+
+# precompiled fixed size formats, these are used for every number in a save
+double_struct = struct.Struct(">d")
+bool_struct = struct.Struct("b")
+version_struct = struct.Struct("<i")
+
+# decoded strings up to intern_max_length bytes long, keyed by their encoded
+# bytes. keys and item names repeat thousands of times in a save, with this
+# they all share one str object and skip the utf-8 decode. it's capped since
+# item parameters can hold any number of different strings
+interned = {}
+intern_max_length = 64
+intern_max_size = 65536
 
 
 def unpack_str(bytes):
@@ -101,12 +122,7 @@ def pack_vlqs(var):
 
 # <vlq len of str><str>
 def unpack_vlq_str(data):
-    if data[0] == "\x00":
-        return "", 0
-    vlq = unpack_vlq(data)
-    pat = str(vlq[0]) + "c"
-    string = unpack_from(pat, data, vlq[1]), (vlq[1] + vlq[0])
-    return unpack_str(string[0]), string[1]
+    return read_vlq_str(data, 0)
 
 
 def pack_vlq_str(var):
@@ -119,22 +135,13 @@ def pack_vlq_str(var):
 
 # <vlq total items><vlq str len><str>...
 def unpack_str_list(data):
-    list_total = unpack_vlq(data)
-    offset = list_total[1]
-    str_list = []
-    for i in range(list_total[0]):
-        vlq_str = unpack_vlq_str(data[offset:])
-        str_list.append(vlq_str[0])
-        offset += vlq_str[1]
-    return str_list, offset
+    return read_str_list(data, 0)
 
 
 def pack_str_list(var):
-    list_total = len(var)
-    str_list = b""
-    for string in var:
-        str_list += pack_vlq_str(string)
-    return pack_vlq(list_total) + str_list
+    encoder = SaveEncoder()
+    encoder.write_str_list(var)
+    return bytes(encoder.buf)
 
 
 # unset value, 0 bytes
@@ -148,16 +155,16 @@ def pack_variant1(var):
 
 # big endian double
 def unpack_variant2(data):
-    return unpack_from(">d", data, 0)[0], 8
+    return double_struct.unpack_from(data, 0)[0], 8
 
 
 def pack_variant2(var):
-    return pack(">d", var)
+    return double_struct.pack(var)
 
 
 # boolean
 def unpack_variant3(data):
-    variant = unpack_from("b", data, 0)
+    variant = bool_struct.unpack_from(data, 0)
     if variant[0] == 1:
         return True, 1
     else:
@@ -165,7 +172,7 @@ def unpack_variant3(data):
 
 
 def pack_variant3(var):
-    return pack("b", var)
+    return bool_struct.pack(var)
 
 
 # variant list
@@ -182,11 +189,9 @@ def unpack_variant6(data):
 
 
 def pack_variant6(var):
-    total = len(var)
-    variant_list = b""
-    for variant in var:
-        variant_list += pack_variant(variant)
-    return pack_vlq(total) + variant_list
+    encoder = SaveEncoder()
+    encoder.write_variant6(var)
+    return bytes(encoder.buf)
 
 
 # variant dict
@@ -206,13 +211,9 @@ def unpack_variant7(data):
 
 
 def pack_variant7(var):
-    total = len(var)
-    dict_items = b""
-    for k in var.keys():
-        key = pack_vlq_str(k)
-        value = pack_variant(var[k])
-        dict_items += key + value
-    return pack_vlq(total) + dict_items
+    encoder = SaveEncoder()
+    encoder.write_variant7(var)
+    return bytes(encoder.buf)
 
 
 def unpack_variant(data):
@@ -224,22 +225,9 @@ def unpack_variant(data):
 
 
 def pack_variant(var):
-    if var is None:
-        return b'\x01' + variant_types[1][1](var)
-    elif type(var) is float:
-        return b'\x02' + variant_types[2][1](var)
-    elif type(var) is bool:
-        return b'\x03' + variant_types[3][1](var)
-    elif type(var) is int:
-        return b'\x04' + variant_types[4][1](var)
-    elif type(var) is str:
-        return b'\x05' + variant_types[5][1](var)
-    elif type(var) is list:
-        return b'\x06' + variant_types[6][1](var)
-    elif type(var) is dict:
-        return b'\x07' + variant_types[7][1](var)
-    else:
-        raise WrongSaveVer("Unsupported variant type")
+    encoder = SaveEncoder()
+    encoder.write_variant(var)
+    return bytes(encoder.buf)
 
 
 def unpack_starsave(data):
@@ -249,7 +237,7 @@ def unpack_starsave(data):
     save["entity_name"] = entity_name[0]
     offset = entity_name[1]
 
-    variant_ver = unpack_from("<i", data, offset)
+    variant_ver = version_struct.unpack_from(data, offset)
     save["variant_version"] = variant_ver[0]
     offset += 4
 
@@ -266,21 +254,9 @@ def unpack_starsave(data):
 
 
 def pack_starsave(var):
-    data = b''
-
-    entity_name = pack_vlq_str(var["entity_name"])
-    data += entity_name
-
-    variant_ver = pack("<i", var["variant_version"])
-    data += variant_ver
-
-    sub_ver = pack_vlq(var["variant_subversion"])
-    data += sub_ver
-
-    save_data = pack_variant(var["data"])
-    data += save_data
-
-    return data
+    encoder = SaveEncoder()
+    encoder.write_starsave(var)
+    return bytes(encoder.buf)
 
 
 # just grabs any remaining bytes
@@ -341,6 +317,519 @@ variant_types = (
 )
 
 
+# the unpack_* functions above pass data[offset:] down to the next call, which
+# copies the rest of the buffer every time when given bytes. the read_*
+# functions below walk a single buffer (the whole file as bytes or an mmap)
+# with an explicit cursor instead. they all take (data, offset) and return
+# (value, new offset), where new offset is absolute, not a length. data can
+# be bytes, an mmap or a memoryview of bytes, strings are decoded straight
+# from slices of it
+def read_vlq(data, offset):
+    # nearly every vlq in a save is a single byte
+    value = data[offset]
+    if value < 0x80:
+        return value, offset + 1
+    value = 0
+    while True:
+        tmp = data[offset]
+        value = (value << 7) | (tmp & 0x7f)
+        offset += 1
+        if tmp & 0x80 == 0:
+            return value, offset
+
+
+def read_vlqs(data, offset):
+    value, offset = read_vlq(data, offset)
+    if (value & 1) == 0x00:
+        return (value >> 1), offset
+    else:
+        return -((value >> 1)+1), offset
+
+
+def intern_str(raw):
+    """Return the shared str for a short encoded string."""
+    try:
+        string = interned.get(raw)
+    except (TypeError, ValueError):
+        # slices of a memoryview over a writable buffer can't be hashed
+        raw = bytes(raw)
+        string = interned.get(raw)
+    if string is None:
+        string = str(raw, "utf-8")
+        if len(interned) < intern_max_size:
+            # a memoryview would keep the whole buffer alive
+            interned[bytes(raw)] = string
+    return string
+
+
+def read_vlq_str(data, offset):
+    length = data[offset]
+    if length < 0x80:
+        offset += 1
+    else:
+        length, offset = read_vlq(data, offset)
+    end = offset + length
+    if length <= intern_max_length:
+        return intern_str(data[offset:end]), end
+    return str(data[offset:end], "utf-8"), end
+
+
+def read_str_list(data, offset):
+    total, offset = read_vlq(data, offset)
+    str_list = []
+    append = str_list.append
+    for i in range(total):
+        length = data[offset]
+        if length < 0x80:
+            offset += 1
+        else:
+            length, offset = read_vlq(data, offset)
+        end = offset + length
+        if length <= intern_max_length:
+            append(intern_str(data[offset:end]))
+        else:
+            append(str(data[offset:end], "utf-8"))
+        offset = end
+    return str_list, offset
+
+
+def read_variant1(data, offset):
+    return None, offset
+
+
+def read_variant2(data, offset):
+    return double_struct.unpack_from(data, offset)[0], offset + 8
+
+
+def read_variant3(data, offset):
+    return data[offset] == 1, offset + 1
+
+
+# the container readers below decode empty slots and small numbers in place
+# rather than going through variant_readers, most of the nodes in a save are
+# one of those
+def read_variant6(data, offset):
+    total, offset = read_vlq(data, offset)
+    variants = []
+    append = variants.append
+    unpack_double = double_struct.unpack_from
+    for i in range(total):
+        variant_type = data[offset]
+        if variant_type == 1:
+            append(None)
+            offset += 1
+        elif variant_type == 5 and data[offset+1] <= intern_max_length:
+            end = offset + 2 + data[offset+1]
+            append(intern_str(data[offset+2:end]))
+            offset = end
+        elif variant_type == 4 and data[offset+1] < 0x80:
+            value = data[offset+1]
+            append(-((value >> 1)+1) if value & 1 else value >> 1)
+            offset += 2
+        elif variant_type == 2:
+            append(unpack_double(data, offset + 1)[0])
+            offset += 9
+        else:
+            variant, offset = variant_readers[variant_type](data, offset + 1)
+            append(variant)
+    return variants, offset
+
+
+def read_variant7(data, offset):
+    total, offset = read_vlq(data, offset)
+    dict_items = {}
+    unpack_double = double_struct.unpack_from
+    for i in range(total):
+        # keys are short, so their length is almost always a single byte
+        length = data[offset]
+        if length <= intern_max_length:
+            end = offset + 1 + length
+            key = intern_str(data[offset+1:end])
+            offset = end
+        else:
+            key, offset = read_vlq_str(data, offset)
+        variant_type = data[offset]
+        if variant_type == 1:
+            dict_items[key] = None
+            offset += 1
+        elif variant_type == 5 and data[offset+1] <= intern_max_length:
+            end = offset + 2 + data[offset+1]
+            dict_items[key] = intern_str(data[offset+2:end])
+            offset = end
+        elif variant_type == 4 and data[offset+1] < 0x80:
+            value = data[offset+1]
+            dict_items[key] = -((value >> 1)+1) if value & 1 else value >> 1
+            offset += 2
+        elif variant_type == 2:
+            dict_items[key] = unpack_double(data, offset + 1)[0]
+            offset += 9
+        elif variant_type == 3:
+            dict_items[key] = data[offset+1] == 1
+            offset += 2
+        else:
+            dict_items[key], offset = variant_readers[variant_type](data,
+                                                                  offset + 1)
+    return dict_items, offset
+
+
+def read_variant(data, offset):
+    # variant types are always a single byte vlq
+    return variant_readers[data[offset]](data, offset + 1)
+
+
+def read_starsave_header(data, offset):
+    """Read everything in a starsave up to the entity itself."""
+    save = {}
+
+    save["entity_name"], offset = read_vlq_str(data, offset)
+
+    save["variant_version"] = version_struct.unpack_from(data, offset)[0]
+    offset += 4
+
+    # TODO: not sure what this is really, best guess
+    save["variant_subversion"], offset = read_vlq(data, offset)
+
+    return save, offset
+
+
+def read_starsave(data, offset, keys=None):
+    save, offset = read_starsave_header(data, offset)
+
+    if keys is None:
+        save["data"], offset = read_variant(data, offset)
+    elif data[offset] != 7:
+        raise WrongSaveVer("Variant is not a dict")
+    else:
+        # skip the dict variant type, offset is None if it stopped early
+        save["data"], offset = read_variant7_keys(data, offset + 1, keys, True)
+
+    return save, offset
+
+
+def read_the_rest(data, offset):
+    return bytes(data[offset:]), len(data)
+
+
+def read_var(var, data, offset):
+    pattern = var[1]
+
+    if pattern in save_file_readers:
+        return save_file_readers[pattern](data, offset)
+    else:
+        return unpack_from(pattern, data, offset), offset + var[2]
+
+
+# partial decoding
+# these work out where a variant ends without building its value, so any
+# keys nobody asked for can be stepped over cheaply
+def skip_vlq(data, offset):
+    while data[offset] & 0x80:
+        offset += 1
+    return offset + 1
+
+
+def skip_vlq_str(data, offset):
+    length, offset = read_vlq(data, offset)
+    return offset + length
+
+
+def skip_variant(data, offset, limit=sys.maxsize):
+    """Return the offset just past the variant starting at offset, or None
+    if it goes on past limit.
+
+    This is done with an explicit stack rather than recursion since skipping
+    is mostly spent in huge bags of tiny item dicts, where the function call
+    per node costs more than the work itself."""
+    stack = []
+    remaining = 1
+    in_dict = False
+    while True:
+        if remaining == 0:
+            if len(stack) == 0:
+                return offset
+            remaining, in_dict = stack.pop()
+            continue
+        remaining -= 1
+        if offset > limit:
+            return None
+
+        if in_dict:
+            length = data[offset]
+            if length & 0x80:
+                length, offset = read_vlq(data, offset)
+            else:
+                offset += 1
+            offset += length
+
+        variant_type = data[offset]
+        offset += 1
+        if variant_type == 1:
+            pass
+        elif variant_type == 2:
+            offset += 8
+        elif variant_type == 3:
+            offset += 1
+        elif variant_type == 4:
+            offset = skip_vlq(data, offset)
+        elif variant_type == 5:
+            offset = skip_vlq_str(data, offset)
+        elif variant_type == 6 or variant_type == 7:
+            stack.append((remaining, in_dict))
+            remaining, offset = read_vlq(data, offset)
+            in_dict = variant_type == 7
+        else:
+            raise WrongSaveVer("Unknown variant type %d" % variant_type)
+
+
+def parse_keys(paths):
+    """Turn a list of dotted key paths into a nested dict for
+    read_variant7_keys, ie. ["uuid", "inventory.bag"] becomes
+    {"uuid": None, "inventory": {"bag": None}}."""
+    keys = {}
+    for path in paths:
+        node = keys
+        parts = path.split(".")
+        for part in parts[:-1]:
+            if node.get(part, {}) is None:
+                # already reading the whole parent
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = None
+    return keys
+
+
+def read_variant7_keys(data, offset, keys, stop=False):
+    """Read a variant dict but only decode the given keys, skipping the rest.
+
+    keys maps each wanted key to a dict of its own wanted keys, or None to
+    decode the whole value. With stop set it returns as soon as every key
+    has been found, offset is None in that case."""
+    total, offset = read_vlq(data, offset)
+    dict_items = {}
+    remaining = len(keys)
+    for i in range(total):
+        if stop and remaining == 0:
+            return dict_items, None
+        key, offset = read_vlq_str(data, offset)
+        if key not in keys:
+            offset = skip_variant(data, offset)
+        elif keys[key] is None or data[offset] != 7:
+            dict_items[key], offset = read_variant(data, offset)
+            remaining -= 1
+        else:
+            dict_items[key], offset = read_variant7_keys(data, offset + 1,
+                                                         keys[key])
+            remaining -= 1
+    return dict_items, offset
+
+
+def read_variant7_index(data, offset):
+    """Read the variant dict at offset like read_variant, but also return
+    the same key list as index_variant7."""
+    if data[offset] != 7:
+        raise WrongSaveVer("Variant is not a dict")
+    total, offset = read_vlq(data, offset + 1)
+    dict_items = {}
+    keys = []
+    for i in range(total):
+        key, offset = read_vlq_str(data, offset)
+        dict_items[key], end = read_variant(data, offset)
+        keys.append((key, offset, end - offset))
+        offset = end
+    return dict_items, keys, offset
+
+
+def index_variant7(data, offset):
+    """Return a list of (key, value offset, value length) for each key of the
+    variant dict at offset, and the offset just past the dict."""
+    if data[offset] != 7:
+        raise WrongSaveVer("Variant is not a dict")
+    total, offset = read_vlq(data, offset + 1)
+    keys = []
+    for i in range(total):
+        key, offset = read_vlq_str(data, offset)
+        end = skip_variant(data, offset)
+        keys.append((key, offset, end - offset))
+        offset = end
+    return keys, offset
+
+
+# cursor based versions of save_file_types and variant_types
+save_file_readers = {
+    "__starsave__": read_starsave,
+    "__the_rest__": read_the_rest
+}
+
+variant_readers = (
+    None,
+    read_variant1,
+    read_variant2,
+    read_variant3,
+    read_vlqs,
+    read_vlq_str,
+    read_variant6,
+    read_variant7
+)
+
+
+class SaveEncoder(object):
+    """Encode save data into one growable bytearray.
+
+    If a file-like sink is given the buffer is written out and emptied each
+    time it grows past chunk_size, so a whole save can be streamed to disk
+    without ever holding a second full copy of it in memory."""
+    def __init__(self, sink=None, chunk_size=65536):
+        self.buf = bytearray()
+        self.sink = sink
+        self.chunk_size = chunk_size
+
+    def flush(self):
+        if self.sink is not None and len(self.buf) > 0:
+            self.sink.write(self.buf)
+            self.buf = bytearray()
+
+    def check_flush(self):
+        if self.sink is not None and len(self.buf) >= self.chunk_size:
+            self.flush()
+
+    def write(self, data):
+        self.buf += data
+
+    def write_vlq(self, n):
+        if 0 <= n < 0x80:
+            self.buf.append(n)
+        elif 0x80 <= n < 0x4000:
+            self.buf.append(n >> 7 | 0x80)
+            self.buf.append(n & 0x7f)
+        else:
+            self.buf += pack_vlq(n)
+
+    def write_vlqs(self, var):
+        self.write_vlq(var * 2 if var >= 0 else -var * 2 - 1)
+
+    def write_vlq_str(self, var):
+        string = var.encode("utf-8")
+        self.write_vlq(len(string))
+        self.buf += string
+
+    def write_key(self, var):
+        """Write a dict key, keys repeat a lot so their encoding is cached."""
+        encoded = encoded_keys.get(var)
+        if encoded is None:
+            encoded = pack_vlq_str(var)
+            if len(encoded_keys) < encoded_keys_max:
+                encoded_keys[var] = encoded
+        self.buf += encoded
+
+    def write_str_list(self, var):
+        self.write_vlq(len(var))
+        for string in var:
+            self.write_vlq_str(string)
+        self.check_flush()
+
+    def write_variant1(self, var):
+        pass
+
+    def write_variant2(self, var):
+        self.buf += double_struct.pack(var)
+
+    def write_variant3(self, var):
+        self.buf += bool_struct.pack(var)
+
+    # lists of strings, lists of empty slots and item dicts make up most of
+    # a save, so strings and None are written in place in the loops below
+    def write_variant6(self, var):
+        self.write_vlq(len(var))
+        buf = self.buf
+        pack_double = double_struct.pack
+        for variant in var:
+            if variant is None:
+                buf.append(1)
+            elif type(variant) is str:
+                buf.append(5)
+                self.write_vlq_str(variant)
+            elif type(variant) is float:
+                buf.append(2)
+                buf += pack_double(variant)
+            else:
+                self.write_variant(variant)
+                if self.sink is not None and len(self.buf) >= self.chunk_size:
+                    self.flush()
+                    buf = self.buf
+
+    def write_variant7(self, var):
+        self.write_vlq(len(var))
+        buf = self.buf
+        pack_double = double_struct.pack
+        for k, v in var.items():
+            self.write_key(k)
+            if v is None:
+                buf.append(1)
+            elif type(v) is int and -0x40 <= v < 0x40:
+                buf.append(4)
+                buf.append(v * 2 if v >= 0 else -v * 2 - 1)
+            elif type(v) is str:
+                buf.append(5)
+                self.write_vlq_str(v)
+            elif type(v) is float:
+                buf.append(2)
+                buf += pack_double(v)
+            else:
+                self.write_variant(v)
+                if self.sink is not None and len(self.buf) >= self.chunk_size:
+                    self.flush()
+                    buf = self.buf
+
+    def write_variant(self, var):
+        try:
+            variant_type, writer = variant_writers[type(var)]
+        except KeyError:
+            raise WrongSaveVer("Unsupported variant type")
+        self.buf.append(variant_type)
+        writer(self, var)
+
+    def write_starsave_header(self, var):
+        self.write_vlq_str(var["entity_name"])
+        self.buf += version_struct.pack(var["variant_version"])
+        self.write_vlq(var["variant_subversion"])
+
+    def write_starsave(self, var):
+        self.write_starsave_header(var)
+        self.write_variant(var["data"])
+
+    def write_var(self, var, data):
+        pattern = var[1]
+
+        if pattern in save_file_writers:
+            save_file_writers[pattern](self, data)
+        else:
+            self.buf += pack(pattern, *data)
+
+
+# SaveEncoder methods for the special save file types
+save_file_writers = {
+    "__starsave__": SaveEncoder.write_starsave,
+    "__the_rest__": SaveEncoder.write
+}
+
+# python type: (variant type, SaveEncoder method)
+variant_writers = {
+    type(None): (1, SaveEncoder.write_variant1),
+    float: (2, SaveEncoder.write_variant2),
+    bool: (3, SaveEncoder.write_variant3),
+    int: (4, SaveEncoder.write_vlqs),
+    str: (5, SaveEncoder.write_vlq_str),
+    list: (6, SaveEncoder.write_variant6),
+    dict: (7, SaveEncoder.write_variant7)
+}
+
+# encoded dict keys, there's only a few hundred distinct ones in a save but
+# item parameters can add more so it's capped
+encoded_keys = {}
+encoded_keys_max = 4096
+
+
 def new_item_data(name, count=1, data={}):
     if name is None:
         return None
@@ -371,57 +860,386 @@ def empty_slot():
     return new_item_data("")
 
 
+# top level keys needed to list and preview a player without decoding the
+# whole save. statusController is only there for the save version check
+summary_keys = ("uuid", "identity", "playTime", "statusController",
+                "inventory.equipment")
+
+
 class WrongSaveVer(Exception):
     pass
 
 
-class PlayerSave(object):
-    def __init__(self, filename):
+def same_variant(a, b):
+    """Check if two variants would be saved the same way. Unlike == this
+    doesn't treat 1, 1.0 and True as equal, and NaNs are the same."""
+    if type(a) is not type(b):
+        return False
+    if type(a) is float:
+        return double_struct.pack(a) == double_struct.pack(b)
+    if type(a) is dict:
+        return (len(a) == len(b) and
+                all(k in b and same_variant(v, b[k]) for k, v in a.items()))
+    if type(a) is list:
+        return (len(a) == len(b) and
+                all(same_variant(x, y) for x, y in zip(a, b)))
+    return a == b
+
+
+class SaveEntity(MutableMapping):
+    """Top level entity mapping that remembers which keys may have changed
+    since they were read from data.
+
+    spans maps each key to the (offset, length) of its value in data. Keys
+    missing from values are decoded the first time they're looked up, so a
+    lazy save can start with no values at all. Any dict or list handed out
+    with [] is assumed to be edited by whoever got it, use peek() to read
+    without that. This is not a real dict, use load_all() to get one.
+
+    Values can also be set already encoded with set_encoded(), they're kept
+    that way until something looks them up."""
+    def __init__(self, data, spans, values=None):
+        self.data = data
+        self.spans = spans
+        self.values = {} if values is None else values
+        self.encoded = {}
+        self.order = list(spans) if values is None else list(values)
+        self.dirty = set()
+
+    def read(self, key):
+        """Return a value without keeping it decoded if it wasn't already.
+        It must not be edited in place."""
+        if key in self.values:
+            return self.values[key]
+        if key in self.encoded:
+            return read_variant(self.encoded[key], 0)[0]
+        if self.data is None or key not in self.spans:
+            raise KeyError(key)
+        return read_variant(self.data, self.spans[key][0])[0]
+
+    def peek(self, key):
+        """Return a value without marking it as changed. It must not be
+        edited in place."""
+        if key in self.values:
+            return self.values[key]
+        value = self.read(key)
+        self.encoded.pop(key, None)
+        self.values[key] = value
+        return value
+
+    def __getitem__(self, key):
+        value = self.peek(key)
+        if type(value) is dict or type(value) is list:
+            self.dirty.add(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            self.order.append(key)
+        elif same_variant(self.peek(key), value):
+            return
+        self.encoded.pop(key, None)
+        self.values[key] = value
+        self.dirty.add(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.order.remove(key)
+        self.values.pop(key, None)
+        self.encoded.pop(key, None)
+        self.spans.pop(key, None)
+        self.dirty.discard(key)
+
+    def __contains__(self, key):
+        return (key in self.values or key in self.spans or
+                key in self.encoded)
+
+    def __iter__(self):
+        return iter(list(self.order))
+
+    def __len__(self):
+        return len(self.order)
+
+    def __repr__(self):
+        return repr(dict((k, self.peek(k)) for k in self.order))
+
+    def is_clean(self, key):
+        """Check if a key can be copied verbatim from data."""
+        return (self.data is not None and key in self.spans and
+                key not in self.dirty)
+
+    def set_encoded(self, key, encoded):
+        """Set a value from its encoded variant bytes. Nothing changes if
+        they decode to the same as the saved value."""
+        if key not in self:
+            self.order.append(key)
+        elif self.is_clean(key):
+            # only decode when the bytes differ, ie. dict keys in another order
+            offset, length = self.spans[key]
+            if (self.data[offset:offset+length] == encoded or
+                    same_variant(self.read(key), read_variant(encoded, 0)[0])):
+                return
+        self.values.pop(key, None)
+        self.encoded[key] = encoded
+        self.dirty.add(key)
+
+    def write(self, encoder):
+        """Encode as a variant dict, copying clean values straight from
+        data."""
+        encoder.buf.append(7)
+        encoder.write_vlq(len(self.order))
+        for key in list(self.order):
+            encoder.write_vlq_str(key)
+            if self.is_clean(key):
+                offset, length = self.spans[key]
+                encoder.write(self.data[offset:offset+length])
+            elif key in self.encoded:
+                encoder.write(self.encoded[key])
+            else:
+                encoder.write_variant(self.peek(key))
+            encoder.check_flush()
+
+    def load_all(self):
+        """Decode every key and return them as a plain dict, keeping the
+        order they were saved in."""
+        return dict((k, self[k]) for k in self.order)
+
+
+def fsync_folder(folder):
+    """Make sure a rename in folder is on disk. Not every OS can open a
+    folder to do this, those just skip it."""
+    try:
+        fd = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def write_atomic(filename, write):
+    """Call write with a binary file next to filename and swap it in once
+    it's safely on disk. A crash leaves either the old file or the new one,
+    never half of one."""
+    folder = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_file = tempfile.mkstemp(dir=folder, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(filename):
+            shutil.copymode(filename, tmp_file)
+        os.replace(tmp_file, filename)
+    except:
+        os.remove(tmp_file)
+        raise
+    fsync_folder(folder)
+
+
+class EntityFile(object):
+    """What every file holding a versioned entity shares, like PlayerSave
+    and versionedjson.VersionedJson.
+
+    Subclasses keep the entity, which is a SaveEntity if it's a dict read
+    from a file, the original data it was read from as raw and the memory
+    map of a lazily read file as file_map. They write the whole file with
+    write_save(encoder)."""
+    entity = None
+    raw = None
+    file_map = None
+
+    def close(self):
+        """Release the memory mapped file of a lazy read. Keys that haven't
+        been used yet can't be read after this."""
+        if self.file_map is None:
+            return
+        if isinstance(self.entity, SaveEntity):
+            self.entity.data = None
+        self.raw = None
+        self.file_map.close()
+        self.file_map = None
+
+    def detach(self):
+        """Copy a lazily read file into memory and release it, it can be
+        overwritten safely after this."""
+        if self.file_map is None:
+            return
+        raw = self.file_map[:]
+        self.close()
+        self.raw = raw
+        if isinstance(self.entity, SaveEntity):
+            self.entity.data = raw
+
+    def peek(self, key):
+        """Return a top level entity value that won't be changed by the
+        caller."""
+        if isinstance(self.entity, SaveEntity):
+            return self.entity.peek(key)
+        return self.entity[key]
+
+    def touch(self, key):
+        """Return a top level entity value that may be changed by the caller.
+        It will be encoded again on export instead of copied from the
+        original data."""
+        if isinstance(self.entity, SaveEntity):
+            self.entity.dirty.add(key)
+        return self.entity[key]
+
+    def set_value(self, value, key, *path):
+        """Set a value nested inside a top level entity key. The key is only
+        marked as changed if the value is actually different."""
+        target = self.peek(key)
+        for k in path[:-1]:
+            target = target[k]
+        try:
+            if same_variant(target[path[-1]], value):
+                return
+        except (KeyError, IndexError):
+            pass
+        self.touch(key)
+        target[path[-1]] = value
+
+    def is_clean(self, key):
+        """Check if a top level key can be copied verbatim from the original
+        data."""
+        if self.raw is None or not isinstance(self.entity, SaveEntity):
+            return False
+        return self.entity.is_clean(key)
+
+    def export_save(self, filename=None):
+        """Encode the file, returning the bytes if filename is None. filename
+        can also be an open file object to stream it into."""
+        # the file may be about to be overwritten
+        self.detach()
+
+        if filename is None:
+            encoder = SaveEncoder()
+            self.write_save(encoder)
+            return bytes(encoder.buf)
+        elif hasattr(filename, "write"):
+            self.write_save(SaveEncoder(filename))
+            return filename
+        else:
+            write_atomic(filename, lambda f: self.write_save(SaveEncoder(f)))
+            return filename
+
+
+class PlayerSave(EntityFile):
+    def __init__(self, filename, keys=None, lazy=False, index_file=None,
+                 entity=None):
         self.data = {}
         self.entity = None
+        self.index = None
 
         self.filename = filename
-
-        self.import_save(filename)
+        # only decode these top level keys (dotted paths for nested keys),
+        # saves read like this can't be exported again
+        self.keys = keys
+        # memory map the save and decode top level keys as they're used. the
+        # key offsets are kept in index_file if one is given
+        self.lazy = lazy
+        self.index_file = index_file
+        self.file_map = None
+
+        # the original save data. unchanged top level keys are copied from
+        # it verbatim on export
+        self.raw = None
+        self.spans = {}
+
+        # a partial entity that was already decoded, ie. from a save cache
+        if entity is not None:
+            self.load_entity(entity)
+        else:
+            self.import_save(filename)
+
+    def load_entity(self, entity):
+        """Use an already decoded entity instead of reading the save file.
+        Like any partially read save it can't be exported."""
+        if self.keys is None:
+            raise WrongSaveVer("Only partially read saves can be loaded")
+        self.data = {
+            "header": tuple(bytes([x]) for x in data_version.encode("utf-8")),
+            "save": {"data": entity},
+            "the_rest": b""
+        }
+        self.entity = entity
 
     def import_save(self, filename=None):
         logging.debug("Init save import: " + filename)
+        self.close()
         save_file = open(filename, mode="rb")
-        save_data = save_file.read()
+        if self.lazy:
+            try:
+                self.file_map = mmap.mmap(save_file.fileno(), 0,
+                                          access=mmap.ACCESS_READ)
+            except ValueError:
+                save_file.close()
+                msg = "Save file is corrupt"
+                logging.exception(msg)
+                raise WrongSaveVer(msg)
+            save_data = self.file_map
+        else:
+            save_data = save_file.read()
 
         # do a version check first
         try:
             save_ver = unpack_str(unpack_var(data_format[0], save_data)[0])
         except struct.error:
             save_file.close()
+            self.close()
             msg = "Save file is corrupt"
             logging.exception(msg)
             raise WrongSaveVer(msg)
 
         if save_ver != data_version:
             save_file.close()
+            self.close()
             msg = "Wrong save format version"
             logging.exception(msg)
             raise WrongSaveVer(msg)
 
+        self.raw = None
+        self.spans = {}
+
         # populate self.data with save data
         offset = 0
         for var in data_format:
             try:
-                unpacked = unpack_var(var, save_data[offset:])
+                if self.lazy and var[1] == "__starsave__":
+                    unpacked, offset = self.read_lazy(filename, save_data,
+                                                      offset)
+                elif self.keys is not None and var[1] == "__starsave__":
+                    unpacked, offset = read_starsave(save_data, offset,
+                                                     parse_keys(self.keys))
+                elif var[1] == "__starsave__":
+                    unpacked, offset = self.read_indexed(filename, save_data,
+                                                         offset)
+                elif offset is None:
+                    # partial read stopped before the end of the save
+                    unpacked = b""
+                else:
+                    unpacked, offset = read_var(var, save_data, offset)
             except:
+                save_file.close()
+                self.close()
                 msg = "Save file is corrupt"
                 logging.exception(msg)
                 raise WrongSaveVer(msg)
 
-            self.data[var[0]] = unpacked[0]
-            offset += unpacked[1]
+            self.data[var[0]] = unpacked
 
         # TODO: this is a temporary workaround to the save ver not being
         # changed in nightly. it should be removed when nightly goes stable
         # and people stop using those save files
-        if "statusController" not in self.data["save"]["data"]:
+        check_status = self.keys is None or "statusController" in self.keys
+        if check_status and "statusController" not in self.data["save"]["data"]:
             save_file.close()
+            self.close()
             msg = "Wrong save format version"
             logging.exception(msg)
             raise WrongSaveVer(msg)
@@ -429,44 +1247,123 @@ class PlayerSave(object):
         save_file.close()
 
         self.entity = self.data["save"]["data"]
+        if self.keys is None:
+            self.raw = save_data
+
+    def read_lazy(self, filename, data, offset):
+        save, entity_offset = read_starsave_header(data, offset)
+
+        index = None
+        if self.index_file is not None:
+            index = self.load_index(filename, self.index_file)
+        if index is None or index["entity_offset"] != entity_offset:
+            index = self.build_index(filename, data, entity_offset,
+                                     self.index_file)
+        self.index = index
+
+        self.spans = dict((x[0], (x[1], x[2])) for x in index["keys"])
+        save["data"] = SaveEntity(data, self.spans)
+        return save, index["end"]
+
+    def read_indexed(self, filename, data, offset):
+        save, entity_offset = read_starsave_header(data, offset)
+        save["data"], keys, end = read_variant7_index(data, entity_offset)
+        self.index = self.make_index(filename, entity_offset, keys, end)
+        self.spans = dict((x[0], (x[1], x[2])) for x in keys)
+        save["data"] = SaveEntity(data, self.spans, save["data"])
+        return save, end
+
+    def make_index(self, filename, entity_offset, keys, end):
+        """Return the index of a save file, (key, offset, length) of every
+        top level entity key and the file's size and mtime to tell when it's
+        out of date."""
+        stat = os.stat(filename)
+        return {
+            "version": index_version,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "entity_offset": entity_offset,
+            "end": end,
+            "keys": keys
+        }
+
+    def build_index(self, filename, data, offset, index_file=None):
+        """Find the offset and length of every top level entity key, and
+        optionally write them to index_file."""
+        keys, end = index_variant7(data, offset)
+        index = self.make_index(filename, offset, keys, end)
+
+        if index_file is not None:
+            encoded = json.dumps(index).encode("utf-8")
+            try:
+                write_atomic(index_file, lambda f: f.write(encoded))
+            except OSError:
+                logging.exception("Unable to write save index %s", index_file)
+
+        return index
+
+    def load_index(self, filename, index_file):
+        """Return a saved index if it still matches the save file."""
+        try:
+            with open(index_file) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if type(index) is not dict or index.get("version") != index_version:
+            logging.debug("Save index %s is an old format", index_file)
+            return None
+
+        stat = os.stat(filename)
+        if (index.get("size") != stat.st_size or
+                index.get("mtime_ns") != stat.st_mtime_ns):
+            logging.debug("Save index %s is out of date", index_file)
+            return None
+        return index
 
     def export_save(self, filename=None):
         logging.debug("Init save export: " + self.filename)
+        if self.keys is not None:
+            raise WrongSaveVer("Unable to export a partially read save")
         self.data["save"]["data"] = self.entity
-        player_data = b""
+        return EntityFile.export_save(self, filename)
 
+    def write_save(self, encoder):
         for var in data_format:
-            player_data += pack_var(var, self.data[var[0]])
-
-        if filename is not None:
-            save_file = open(filename, "wb")
-            save_file.write(player_data)
-            save_file.close()
-            return filename
-        else:
-            return player_data
+            if var[1] == "__starsave__" and self.raw is not None:
+                self.write_entity(encoder)
+            else:
+                encoder.write_var(var, self.data[var[0]])
+        encoder.flush()
+
+    def write_entity(self, encoder):
+        """Write the starsave, copying unchanged top level keys straight
+        from the original save data."""
+        encoder.write_starsave_header(self.data["save"])
+        self.entity.write(encoder)
 
     def dump(self):
         pprint(self.data)
 
-    # getters
+    # getters. only the ones handing out containers that are edited in place
+    # use touch, the rest peek and return copies of any containers
     def get_header(self):
         return unpack_str(self.data["header"])
 
     def get_uuid(self):
-        return self.entity["uuid"]
+        return self.peek("uuid")
 
     def get_ship_upgrades(self):
-        return self.entity["shipUpgrades"]
+        return self.touch("shipUpgrades")
 
     def get_quests(self):
-        return self.entity["quests"]
+        return self.touch("quests")
 
     def get_ai(self):
-        return self.entity["aiState"]
+        return self.touch("aiState")
 
     def get_health(self):
-        status = self.entity["statusController"]
+        status = self.peek("statusController")
         health = status["resourceValues"]["health"]
         if math.isnan(health):
             return 100
@@ -474,7 +1371,7 @@ class PlayerSave(object):
             return health
 
     def get_energy(self):
-        status = self.entity["statusController"]
+        status = self.peek("statusController")
         energy = status["resourceValues"]["energy"]
         if math.isnan(energy):
             return 100
@@ -482,48 +1379,48 @@ class PlayerSave(object):
             return energy
 
     def get_gender(self):
-        return self.entity["identity"]["gender"]
+        return self.peek("identity")["gender"]
 
     def get_head(self):
-        equip = self.entity["inventory"]["equipment"]
-        return equip[0], equip[4]
+        equip = self.peek("inventory")["equipment"]
+        return copy.deepcopy(equip[0]), copy.deepcopy(equip[4])
 
     def get_chest(self):
-        equip = self.entity["inventory"]["equipment"]
-        return equip[1], equip[5]
+        equip = self.peek("inventory")["equipment"]
+        return copy.deepcopy(equip[1]), copy.deepcopy(equip[5])
 
     def get_legs(self):
-        equip = self.entity["inventory"]["equipment"]
-        return equip[2], equip[6]
+        equip = self.peek("inventory")["equipment"]
+        return copy.deepcopy(equip[2]), copy.deepcopy(equip[6])
 
     def get_back(self):
-        equip = self.entity["inventory"]["equipment"]
-        return equip[3], equip[7]
+        equip = self.peek("inventory")["equipment"]
+        return copy.deepcopy(equip[3]), copy.deepcopy(equip[7])
 
     def get_main_bag(self):
-        return self.entity["inventory"]["bag"]
+        return copy.deepcopy(self.peek("inventory")["bag"])
 
     def get_object_bag(self):
-        return self.entity["inventory"]["objectBag"]
+        return copy.deepcopy(self.peek("inventory")["objectBag"])
 
     def get_tile_bag(self):
-        return self.entity["inventory"]["tileBag"]
+        return copy.deepcopy(self.peek("inventory")["tileBag"])
 
     def get_action_bar(self):
-        return self.entity["inventory"]["actionBar"]
+        return copy.deepcopy(self.peek("inventory")["actionBar"])
 
     def get_wieldable(self):
-        return self.entity["inventory"]["wieldable"]
+        return copy.deepcopy(self.peek("inventory")["wieldable"])
 
     def get_essentials(self):
-        return self.entity["inventory"]["essentialBar"]
+        return copy.deepcopy(self.peek("inventory")["essentialBar"])
 
     def get_mouse(self):
         # pretend it's a regular bag
-        return [self.entity["inventory"]["swapSlot"]]
+        return [copy.deepcopy(self.peek("inventory")["swapSlot"])]
 
     def get_race(self, pretty=False):
-        race = self.entity["identity"]["species"]
+        race = self.peek("identity")["species"]
         if pretty:
             try:
                 race = race[0].upper() + race[1:]
@@ -532,77 +1429,77 @@ class PlayerSave(object):
         return race
 
     def get_pixels(self):
-        return self.entity["inventory"]["money"]
+        return self.peek("inventory")["money"]
 
     def get_name(self):
-        return self.entity["identity"]["name"]
+        return self.peek("identity")["name"]
 
     def get_description(self):
-        return self.entity["description"]
+        return self.peek("description")
 
     def get_blueprints(self):
-        return self.entity["blueprints"]["knownBlueprints"]
+        return copy.deepcopy(self.peek("blueprints")["knownBlueprints"])
 
     def get_new_blueprints(self):
-        return self.entity["blueprints"]["newBlueprints"]
+        return copy.deepcopy(self.peek("blueprints")["newBlueprints"])
 
     def get_personality(self):
         # these don't seem to be used yet
-        # self.entity["identity"]["personalityArmIdle"]
-        # self.entity["identity"]["personalityArmOffset"]
-        # self.entity["identity"]["personalityHeadOffset"]
-        return self.entity["identity"]["personalityIdle"]
+        # self.peek("identity")["personalityArmIdle"]
+        # self.peek("identity")["personalityArmOffset"]
+        # self.peek("identity")["personalityHeadOffset"]
+        return self.peek("identity")["personalityIdle"]
 
     def get_hair(self):
-        return (self.entity["identity"]["hairGroup"],
-                self.entity["identity"]["hairType"])
+        return (self.peek("identity")["hairGroup"],
+                self.peek("identity")["hairType"])
 
     def get_facial_hair(self):
-        return (self.entity["identity"]["facialHairGroup"],
-                self.entity["identity"]["facialHairType"])
+        return (self.peek("identity")["facialHairGroup"],
+                self.peek("identity")["facialHairType"])
 
     def get_facial_mask(self):
-        return (self.entity["identity"]["facialMaskGroup"],
-                self.entity["identity"]["facialMaskType"])
+        return (self.peek("identity")["facialMaskGroup"],
+                self.peek("identity")["facialMaskType"])
 
     def get_body_directives(self):
-        return self.entity["identity"]["bodyDirectives"]
+        return self.peek("identity")["bodyDirectives"]
 
     def get_emote_directives(self):
-        return self.entity["identity"]["emoteDirectives"]
+        return self.peek("identity")["emoteDirectives"]
 
     def get_hair_directives(self):
-        return self.entity["identity"]["hairDirectives"]
+        return self.peek("identity")["hairDirectives"]
 
     def get_facial_hair_directives(self):
-        return self.entity["identity"]["facialHairDirectives"]
+        return self.peek("identity")["facialHairDirectives"]
 
     def get_facial_mask_directives(self):
-        return self.entity["identity"]["facialMaskDirectives"]
+        return self.peek("identity")["facialMaskDirectives"]
 
     def get_game_mode(self):
-        return self.entity["modeType"]
+        return self.peek("modeType")
 
     def get_play_time(self):
-        return self.entity["playTime"]
+        return self.peek("playTime")
 
     def get_tech_modules(self):
-        return self.entity["techController"]["techModules"]
+        return self.touch("techController")["techModules"]
 
     def get_visible_techs(self):
-        return self.entity["techs"]["visibleTechs"]
+        return copy.deepcopy(self.peek("techs")["visibleTechs"])
 
     def get_enabled_techs(self):
-        return self.entity["techs"]["enabledTechs"]
+        return copy.deepcopy(self.peek("techs")["enabledTechs"])
 
     def get_equipped_techs(self):
-        return self.entity["inventory"]["equipment"][8:12]
+        return copy.deepcopy(self.peek("inventory")["equipment"][8:12])
 
     def get_undy_color(self):
-        return self.entity["identity"]["color"]
+        return self.peek("identity")["color"]
 
     def get_movement(self):
-        return self.entity["movementController"]
+        return self.touch("movementController")
 
     def get_visible(self, equipment):
         slots = None
@@ -643,13 +1540,13 @@ class PlayerSave(object):
         self.entity["aiState"] = ai
 
     def set_blueprints(self, blueprints):
-        self.entity["blueprints"]["knownBlueprints"] = blueprints
+        self.set_value(blueprints, "blueprints", "knownBlueprints")
 
     def set_new_blueprints(self, blueprints):
-        self.entity["blueprints"]["newBlueprints"] = blueprints
+        self.set_value(blueprints, "blueprints", "newBlueprints")
 
     def set_name(self, name):
-        self.entity["identity"]["name"] = name
+        self.set_value(name, "identity", "name")
 
     # TODO: at some point we need to run through and replace all "race"
     # references to species
@@ -657,97 +1554,97 @@ class PlayerSave(object):
         if race == "":
             logging.warning("Attempted to save empty race")
             return
-        self.entity["identity"]["species"] = race.lower()
+        self.set_value(race.lower(), "identity", "species")
 
     def set_pixels(self, pixels):
-        self.entity["inventory"]["money"] = int(pixels)
+        self.set_value(int(pixels), "inventory", "money")
 
     def set_description(self, description):
         self.entity["description"] = description
 
     def set_gender(self, gender):
-        self.entity["identity"]["gender"] = gender.lower()
+        self.set_value(gender.lower(), "identity", "gender")
 
     def set_health(self, current):
         new = current
-        self.entity["statusController"]["resourceValues"]["health"] = new
+        self.set_value(new, "statusController", "resourceValues", "health")
 
     def set_energy(self, current):
         new = current
-        self.entity["statusController"]["resourceValues"]["energy"] = new
+        self.set_value(new, "statusController", "resourceValues", "energy")
 
     def set_main_bag(self, bag):
-        self.entity["inventory"]["bag"] = bag
+        self.set_value(bag, "inventory", "bag")
 
     def set_object_bag(self, bag):
-        self.entity["inventory"]["objectBag"] = bag
+        self.set_value(bag, "inventory", "objectBag")
 
     def set_tile_bag(self, bag):
-        self.entity["inventory"]["tileBag"] = bag
+        self.set_value(bag, "inventory", "tileBag")
 
     def set_action_bar(self, bag):
-        self.entity["inventory"]["actionBar"] = bag
+        self.set_value(bag, "inventory", "actionBar")
 
     def set_wieldable(self, bag):
-        self.entity["inventory"]["wieldable"] = bag
+        self.set_value(bag, "inventory", "wieldable")
 
     def set_essentials(self, bag):
-        self.entity["inventory"]["essentialBar"] = bag
+        self.set_value(bag, "inventory", "essentialBar")
 
     def set_mouse(self, bag):
-        self.entity["inventory"]["swapSlot"] = bag[0]
+        self.set_value(bag[0], "inventory", "swapSlot")
 
     def set_head(self, main, glamor):
-        self.entity["inventory"]["equipment"][0] = main
-        self.entity["inventory"]["equipment"][4] = glamor
+        self.set_value(main, "inventory", "equipment", 0)
+        self.set_value(glamor, "inventory", "equipment", 4)
 
     def set_chest(self, main, glamor):
-        self.entity["inventory"]["equipment"][1] = main
-        self.entity["inventory"]["equipment"][5] = glamor
+        self.set_value(main, "inventory", "equipment", 1)
+        self.set_value(glamor, "inventory", "equipment", 5)
 
     def set_legs(self, main, glamor):
-        self.entity["inventory"]["equipment"][2] = main
-        self.entity["inventory"]["equipment"][6] = glamor
+        self.set_value(main, "inventory", "equipment", 2)
+        self.set_value(glamor, "inventory", "equipment", 6)
 
     def set_back(self, main, glamor):
-        self.entity["inventory"]["equipment"][3] = main
-        self.entity["inventory"]["equipment"][7] = glamor
+        self.set_value(main, "inventory", "equipment", 3)
+        self.set_value(glamor, "inventory", "equipment", 7)
 
     def set_personality(self, idle):
-        self.entity["identity"]["personalityArmIdle"] = idle
+        self.set_value(idle, "identity", "personalityArmIdle")
         # self.entity["identity"]["personalityArmOffset"]
         # self.entity["identity"]["personalityHeadOffset"]
-        self.entity["identity"]["personalityIdle"] = idle
+        self.set_value(idle, "identity", "personalityIdle")
 
     def set_hair(self, group, type):
-        self.entity["identity"]["hairGroup"] = group
-        self.entity["identity"]["hairType"] = type
+        self.set_value(group, "identity", "hairGroup")
+        self.set_value(type, "identity", "hairType")
 
     def set_facial_hair(self, group, type):
-        self.entity["identity"]["facialHairGroup"] = group
-        self.entity["identity"]["facialHairType"] = type
+        self.set_value(group, "identity", "facialHairGroup")
+        self.set_value(type, "identity", "facialHairType")
 
     def set_facial_mask(self, group, type):
-        self.entity["identity"]["facialMaskGroup"] = group
-        self.entity["identity"]["facialMaskType"] = type
+        self.set_value(group, "identity", "facialMaskGroup")
+        self.set_value(type, "identity", "facialMaskType")
 
     def set_body_directives(self, colors):
-        self.entity["identity"]["bodyDirectives"] = colors
+        self.set_value(colors, "identity", "bodyDirectives")
 
     def set_emote_directives(self, colors):
-        self.entity["identity"]["emoteDirectives"] = colors
+        self.set_value(colors, "identity", "emoteDirectives")
 
     def set_hair_directives(self, colors):
-        self.entity["identity"]["hairDirectives"] = colors
+        self.set_value(colors, "identity", "hairDirectives")
 
     def set_facial_hair_directives(self, colors):
-        self.entity["identity"]["facialHairDirectives"] = colors
+        self.set_value(colors, "identity", "facialHairDirectives")
 
     def set_facial_mask_directives(self, colors):
-        self.entity["identity"]["facialMaskDirectives"] = colors
+        self.set_value(colors, "identity", "facialMaskDirectives")
 
     def set_undy_color(self, color):
-        self.entity["identity"]["color"] = color
+        self.set_value(color, "identity", "color")
 
     def set_game_mode(self, mode):
         self.entity["modeType"] = mode
@@ -760,11 +1657,11 @@ class PlayerSave(object):
             "location": None,
             "type": "none"
         }
-        self.entity["inventory"]["primaryHeldSlot"] = empty
-        self.entity["inventory"]["altHeldSlot"] = empty
+        self.set_value(empty, "inventory", "primaryHeldSlot")
+        self.set_value(empty, "inventory", "altHeldSlot")
 
     def clear_new_blueprints(self):
-        self.entity["blueprints"]["newBlueprints"] = []
+        self.set_value([], "blueprints", "newBlueprints")
 
     def set_tech_modules(self, techs, equip):
         # this works similar to the equip items in that it needs to be set
@@ -774,16 +1671,16 @@ class PlayerSave(object):
         equip_index = 8
         for tech in equip:
             item = new_item(tech, 1)
-            self.entity["inventory"]["equipment"][equip_index] = item
+            self.set_value(item, "inventory", "equipment", equip_index)
             equip_index += 1
 
-        self.entity["techController"]["techModules"] = techs
+        self.set_value(techs, "techController", "techModules")
 
     def set_visible_techs(self, techs):
-        self.entity["techs"]["visibleTechs"] = techs
+        self.set_value(techs, "techs", "visibleTechs")
 
     def set_enabled_techs(self, techs):
-        self.entity["techs"]["enabledTechs"] = techs
+        self.set_value(techs, "techs", "enabledTechs")
 
     def set_movement(self, movement):
         self.entity["movementController"] = movement
@@ -6,6 +6,7 @@ import os
 import sys
 import traceback
 import platform
+import multiprocessing
 from PyQt5.QtWidgets import QMessageBox
 
 import config
@@ -80,4 +81,7 @@ def main():
     gui.mainwindow.MainWindow()
 
 if __name__ == "__main__":
+    # asset indexing starts worker processes, frozen windows builds need this
+    # for them to work
+    multiprocessing.freeze_support()
     main()
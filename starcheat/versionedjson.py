@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Import/export any Starbound SBVJ01 versioned JSON file
+
+Players aren't the only thing stored like this, ships, universe metadata
+and the like are too. This reads them with the same variant codec as the
+.player saves, and shares peek/touch/set_value/export_save with
+saves.PlayerSave through saves.EntityFile.
+
+It can also be run from the command line to list what's in some files:
+$ python ./versionedjson.py <file> [<file> ...]
+"""
+
+import logging
+import mmap
+import struct
+import sys
+
+import saves
+from saves import SaveEncoder, SaveEntity, WrongSaveVer
+
+magic = saves.data_version.encode("utf-8")
+
+
+def read_header(data):
+    """Return the starsave header (entity name and versions) of a versioned
+    JSON file and the offset of its entity."""
+    if data[:len(magic)] != magic:
+        raise WrongSaveVer("Not a versioned JSON file")
+    return saves.read_starsave_header(data, len(magic))
+
+
+def detect(filename):
+    """Return (entity name, version) of a versioned JSON file, or None if
+    it isn't one. Only the start of the file is read."""
+    try:
+        with open(filename, "rb") as f:
+            header, offset = read_header(f.read(4096))
+    except (OSError, IndexError, struct.error, UnicodeDecodeError,
+            WrongSaveVer):
+        return None
+    return header["entity_name"], header["variant_version"]
+
+
+class VersionedJson(saves.EntityFile):
+    """A versioned JSON file, read from filename or from data given as bytes
+    or a memoryview.
+
+    An entity that's a dict is a saves.SaveEntity like a player's, so
+    unchanged top level keys are copied verbatim on export. With lazy set a
+    file is memory mapped and keys are only decoded when they're used."""
+    def __init__(self, filename=None, data=None, lazy=False):
+        self.filename = filename
+        self.lazy = lazy
+        self.file_map = None
+
+        self.header = None
+        self.entity = None
+        self.the_rest = b""
+        # the original data, unchanged keys are copied from it on export
+        self.raw = None
+        self.spans = {}
+
+        if data is not None:
+            self.load_data(data)
+        else:
+            self.import_file(filename)
+
+    def import_file(self, filename):
+        logging.debug("Init versioned JSON import: " + filename)
+        self.close()
+        with open(filename, "rb") as f:
+            if not self.lazy:
+                self.load_data(f.read())
+                return
+            try:
+                self.file_map = mmap.mmap(f.fileno(), 0,
+                                          access=mmap.ACCESS_READ)
+            except ValueError:
+                raise WrongSaveVer("File is corrupt")
+        try:
+            self.load_data(self.file_map)
+        except:
+            self.close()
+            raise
+
+    def load_data(self, data):
+        if isinstance(data, memoryview) and data.format != "B":
+            data = data.cast("B")
+
+        try:
+            self.header, offset = read_header(data)
+            if data[offset] == 7 and self.lazy:
+                keys, end = saves.index_variant7(data, offset)
+                self.spans = dict((x[0], (x[1], x[2])) for x in keys)
+                self.entity = SaveEntity(data, self.spans)
+            elif data[offset] == 7:
+                values, keys, end = saves.read_variant7_index(data, offset)
+                self.spans = dict((x[0], (x[1], x[2])) for x in keys)
+                self.entity = SaveEntity(data, self.spans, values)
+            else:
+                self.entity, end = saves.read_variant(data, offset)
+            self.the_rest = saves.read_the_rest(data, end)[0]
+        except (IndexError, TypeError, struct.error, UnicodeDecodeError):
+            msg = "File is corrupt"
+            logging.exception(msg)
+            raise WrongSaveVer(msg)
+
+        self.raw = data
+
+    def get_entity_name(self):
+        return self.header["entity_name"]
+
+    def get_version(self):
+        return self.header["variant_version"]
+
+    def write_save(self, encoder):
+        encoder.write(magic)
+        encoder.write_starsave_header(self.header)
+        if isinstance(self.entity, SaveEntity):
+            self.entity.write(encoder)
+        else:
+            encoder.write_variant(self.entity)
+        encoder.write(self.the_rest)
+        encoder.flush()
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.stderr.write("usage: versionedjson.py <file> [<file> ...]\n")
+        return 2
+
+    errors = 0
+    for filename in sys.argv[1:]:
+        try:
+            versioned = VersionedJson(filename, lazy=True)
+        except (OSError, WrongSaveVer) as e:
+            print("%s: %s" % (filename, e))
+            errors += 1
+            continue
+        if isinstance(versioned.entity, SaveEntity):
+            contents = ", ".join(versioned.entity)
+        else:
+            contents = type(versioned.entity).__name__
+        print("%s: %s v%d (%s)" % (filename, versioned.get_entity_name(),
+                                   versioned.get_version(), contents))
+        versioned.close()
+    return 1 if errors > 0 else 0
+
+if __name__ == "__main__":
+    sys.exit(main())